@@ -5,240 +5,620 @@ boolean functions. Called by plot.py'''
 
 import random as rd
 import itertools
+import json
+import math
+import multiprocessing
 import sys
 
+import numpy as np
+
 import tools as t
+import bittools as bt
+import lattice
+import symmetry
+from cache import functionId
+from dataset import ListEngine, getOmega
+from universe import (MAX_TABLE_M, SharedUniverse, attachUniverse,
+                      getUniverse)
+from functions import monk2, isEven
+from profiling import Profile, NoProfile
+
+# engines used for the construction of the extension sets. They all return the
+# same sets, only their speed differs. They work on Datasets (tools.py works on
+# lists of elements, which are converted).
+engines = {
+        'python' : ListEngine(t),
+        'numpy' : bt,
+        'lattice' : lattice,
+        }
 
 class Sn_Too_Small(Exception):
     pass
 
-monk2 = (lambda x: sum(x) == 2) # MONK2
-isEven = (lambda x: x[-1] == 1) # class is true if x is even
-
-def main(m, n, n_exp, f=monk2):
-
-    # construction of universe. The class of each element x is added at the end
-    universe = [t.bitfield(x, m) for x in range(2**m)]
-    for x in universe:
-        x.append(f(x))
-
-    if n > len(universe):
+# names of the metrics measured in each experiment. main returns their average
+# over all experiments as 'avg' + name, their variance as 'var' + name and the
+# half width of the confidence interval of the average as 'ci' + name.
+metricNames = ['AccNanMV', 'AccNnS', 'AccNnAEStarMV', 'AccNanThry1MV',
+        'Err1MV', 'AccNanThry2MV', 'Err2MV', 'AccNanThry3MV', 'Err3MV',
+        'LambdaMV', 'WMV', 'WMVEst', 'GammaMV', 'PropAMV', 'PropBMV']
+
+# confidence intervals of the averages are given at 95% (normal approximation)
+CI_Z = 1.96
+
+# metrics whose convergence stops the experiments of sweep (with tol)
+convergenceMetrics = ['AccNanMV', 'AccNnS']
+
+# with tol, experiments are run by rounds of this number, and convergence is
+# checked after each round
+ROUND_SIZE = 10
+
+# exact mode of sweep: biggest number of training sets that are enumerated
+# (before symmetry reduction), of experiments that are run for a value of n
+# (after symmetry reduction, and at most n_exp), and of images of training
+# sets (or of codes) computed by the symmetries
+MAX_SUBSETS = 10**6
+MAX_EXACT_EXPERIMENTS = 2 * 10**4
+MAX_ORBIT_WORK = 1 << 22
+
+# universes of bigger dimensions are not used as a whole as test set: the
+# experiments are evaluated on DEFAULT_TEST_SIZE random elements
+MAX_FULL_M = 16
+DEFAULT_TEST_SIZE = 10000
+
+def experimentSeed(seed, n, exp):
+    """return the seed of experiment number exp with |S| = n. It only depends
+    on its arguments so that experiments can be run in any order, in any
+    process."""
+    return '{0}-{1}-{2}'.format(seed, n, exp)
+
+def shuffledIndices(size, seed):
+    """return the array of the indices of the elements of the universe, in a
+    random order given by seed"""
+    order = list(range(size))
+    rd.Random(seed).shuffle(order)
+    return np.array(order, dtype=np.int64)
+
+def sampledCodes(size, k, seed):
+    """return the array of k distinct codes of the universe (of given size),
+    drawn at random with seed. The universe is not materialized."""
+    return np.array(rd.Random(seed).sample(range(size), min(k, size)),
+                    dtype=np.int64)
+
+def trainingOrder(size, seed):
+    """return the array of the indices of the elements of the universe, those
+    of S first. seed is the seed of a random shuffle, or the tuple of the
+    codes of S (in the exact mode of sweep)."""
+    if isinstance(seed, tuple):
+        S = np.array(seed, dtype=np.int64)
+        rest = np.setdiff1d(np.arange(size, dtype=np.int64), S)
+        return np.concatenate((S, rest))
+    return shuffledIndices(size, seed)
+
+def experiment(m, n, f, seed, engine='python', profile=False,
+               testSize=None):
+    """run one experiment: draw S of size n from the universe (using the given
+    seed, see trainingOrder), construct AEMV, and evaluate nn and nan on the
+    rest of the universe (or on testSize random elements of the rest, if
+    given). Return a dict with the value of each metric of metricNames.
+    If profile is True, it also holds the profiling record of the experiment
+    (as 'profile')."""
+
+    e = engines[engine]
+    prof = Profile() if profile else NoProfile()
+
+    # the universe is only built once per process, we work on a shuffle of
+    # the indices of its elements
+    U = getUniverse(m, f)
+    if n > len(U):
         raise Sn_Too_Small
 
-    # average accuracy of nanMV(S, X) (= nanMV algorithm based on S evaluated
-    # on all elements of X)
-    avgAccNanMV = 0
-    # average accuracy of nn(S, X) (= nn algorithm based on S evaluated on all
-    # elements of X)
-    avgAccNnS = 0
-    # average accuracy of nn(AE*MV, X)
-    avgAccNnAEStarMV = 0
-
-    # theorertical accuracies: from roughest to most accurate
-    # first form = acc(nn(S, X)) * lambda + acc(nn(AE*, X)) * (1 - lambda)
-    avgAccNanThry1MV = 0
-    # snd form = acc(nn(S, A)) * lambda + acc(nn(AE*, B)) * (1 - lambda)
-    avgAccNanThry2MV = 0
-    # thd form = acc(nn(S, A)) * |A| / |X| + acc(nn(AE*, B)) * |B| / |X|
-    avgAccNanThry3MV = 0
-
-    avgErr1MV = 0 # average error = difference between acc(nanMV) and formula
-    avgErr2MV = 0 # average error = difference between acc(nanMV) and snd formula
-    avgErr3MV = 0 # average error = difference between acc(nanMV) and trd formula
-
-    # reminder: paper notation
-    # alpha = P(1nan(x) is in S with x in X); beta = P(1nan(x) is in AE* with x
-    # in X) = 1 - alpha.
-    # A = {x in X | 1nan(x) is in S}
-    # B = {x in X | 1nan(x) is in AE*}
-    # A inter B = 0, A union B = X
-
-    avgLambdaMV = 0 # average value of lambda = |S| / |AEMV| (a quite rough
-                    # approximation of alpha)
-    avgWMV = 0 # average omega = prop of correctly classified x in AE*MV
-    avgWMVEst = 0 # average estimation of omega
-    avgGammaMV = 0 # average gamma = |AEMV| / |X|
-    avgPropAMV = 0 # average proportion (over X) of elements in A (= alpha)
-    avgPropBMV = 0 # average proportion (over X) of elements in B (= beta)
-
-
-    for exp in range(n_exp):
-        rd.shuffle(universe) # shuffle elements of the universe
-        S = universe[:n] # S = the n first elements of X
-        testSet = universe[n:] # the rest is the test set
-
-        AEMV = t.constructAEMV(S) # construct AEMV
-        AEStarMV = t.getAEStar(AEMV, S) # construct AEMV* = AEMV \ S
-
-        # compute lamda, omega and gamma
-        currentLambdaMV = float(len(S)) / float(len(AEMV))
-        currentWMV = t.getOmega(AEStarMV, f)
-        currentWMVEst = t.getOmegaMVEst(S)
-        currentGammaMV = float(len(AEMV)) / float(len(universe))
-
-        ######################################
-        ## PERFORMANCE OF NN AND NAN: START ##
-        ######################################
-
-        # perf of 1nn(S, X)
-        nOKnnS = nKOnnS = 0
-        # perf of 1nanMV(S, X)
-        nOKnanMV= nKOnanMV= 0
-        # perf of 1nn(AE*MV, X)
-        nOKnnAEStarMV = nKOnnAEStarMV = 0
-        # perf of 1nn(Sn, A)
-        nOKnnSAMV = nKOnnSAMV = 0
-        # perf of 1nn(AE*MV, B)
-        nOKnnAEStarBMV = nKOnnAEStarBMV = 0
-
-        for x in testSet:
-            # 1nn(S, X)
-            xnnS = t.nn(x[:-1], S, t.hamming)
-            if x[-1] == xnnS[-1]:
-                nOKnnS += 1
-            else:
-                nKOnnS += 1
-
-            ## 1nan(S, X) ( = 1nn(AE, X))
-            xnan = t.nn(x[:-1], AEMV, t.hamming)
-            if x[-1] == xnan[-1]:
-                nOKnanMV += 1
-            else:
-                nKOnanMV += 1
-
-            # 1nn(AE*MV, X). We don't try if AE*MV is empty (which is very
-            # unlikely)
-            if AEStarMV:
-                xnnAEStarMV = t.nn(x[:-1], AEStarMV, t.hamming)
-                if x[-1] == xnnAEStarMV[-1]:
-                    nOKnnAEStarMV += 1
-                else:
-                    nKOnnAEStarMV += 1
-
-            else:
-                nKOnnAEStarMV += 1
-
-
-            # 1nn(S, A). Useful for accuracy 2 and 3
-            if xnan in S: # iff x is in A
-                if x[-1] == xnnS[-1]:
-                    nOKnnSAMV += 1
-                else:
-                    nKOnnSAMV += 1
-
-            # 1nn(S, B). Useful for accuracy 2 and 3
-            else: # iff x is in B
-                if x[-1] == xnnAEStarMV[-1]:
-                    nOKnnAEStarBMV += 1
-                else:
-                    nKOnnAEStarBMV += 1
-
-        ####################################
-        ## PERFORMANCE OF NN AND NAN: END ##
-        ####################################
-
+    if testSize is None:
+        order = trainingOrder(len(U), seed) # shuffle elements of the universe
+        S = U.dataset.take(order[:n]) # S = the n first elements of X
+        testSet = U.dataset.take(order[n:]) # the rest is the test set
+    else:
+        codes = sampledCodes(len(U), n + testSize, seed)
+        S, testSet = U.take(codes[:n]), U.take(codes[n:])
+
+    # construct AEMV and estimate omega in a single pass over the triplets
+    with prof.stage('constructAEMVWithOmegaEst'):
+        AEMV, WMVEst = e.constructAEMVWithOmegaEst(S,
+                stats=prof.stats('constructAEMV'),
+                distinctStats=prof.stats('getOmegaMVEst'))
+    return evaluate(S, testSet, AEMV, WMVEst, U, e, prof)
+
+def nestedExperiment(m, ns, f, seed, engine='python', profile=False,
+                     testSize=None):
+    """run one experiment for each n in ns, where the S of size n are all
+    drawn from the same shuffle of the universe: each S extends the previous
+    one. AEMV is maintained incrementally (whatever the engine, which is
+    only used for the nn searches) instead of being constructed from scratch
+    for each n. If testSize is given, all experiments are evaluated on the
+    same testSize random elements that are not in the biggest S. Return a
+    dict n -> results of the experiment."""
+
+    e = engines[engine]
+
+    U = getUniverse(m, f)
+    if testSize is None:
+        order = shuffledIndices(len(U), seed) # shuffle elements of the universe
+    else:
+        order = sampledCodes(len(U), max(ns) + testSize, seed)
+
+    results = {}
+    AE = bt.IncrementalAEMV()
+    for n in sorted(ns):
+        prof = Profile() if profile else NoProfile()
+        with prof.stage('IncrementalAEMV.add'):
+            # S = the n first elements of X
+            AE.add(U.take(order[len(AE.S):n]),
+                   prof.stats('IncrementalAEMV.add'))
+        # the rest is the test set
+        testSet = U.take(order[n if testSize is None else max(ns):])
+        with prof.stage('constructAEMV'):
+            AEMV = AE.constructAEMV()
+        with prof.stage('getOmegaMVEst'):
+            WMVEst = AE.getOmegaMVEst()
+        results[n] = evaluate(AE.S, testSet, AEMV, WMVEst, U, e, prof)
+    return results
+
+def evaluate(S, testSet, AEMV, currentWMVEst, U, e, prof=NoProfile()):
+    """evaluate nn and nan (based on the Datasets S and AEMV) on the test set,
+    using the nn search of engine e. U is the Universe, giving the true
+    classes. Return a dict with the value of each metric of metricNames, and
+    the record of the Profile prof (if any)."""
+
+    with prof.stage('getAEStar'):
+        AEStarMV = AEMV.without(S) # construct AEMV* = AEMV \ S
+    prof.count('S', len(S))
+    prof.count('AEMV', len(AEMV))
+    prof.count('testSet', len(testSet))
+
+    # compute lamda, omega and gamma
+    currentLambdaMV = float(len(S)) / float(len(AEMV))
+    with prof.stage('getOmega'):
+        currentWMV = getOmega(AEStarMV, U.labelsOf(AEStarMV.codes))
+    currentGammaMV = float(len(AEMV)) / float(len(U))
+
+    # indices of the 1nn of every element of the test set in S, AEMV and
+    # AE*MV. We don't search in AE*MV if it is empty (which is very
+    # unlikely)
+    with prof.stage('nn'):
+        nnS = e.nnBatch(testSet, S)
+        nnAEMV = e.nnBatch(testSet, AEMV)
+        nnAEStarMV = e.nnBatch(testSet, AEStarMV) if AEStarMV else None
+
+    ######################################
+    ## PERFORMANCE OF NN AND NAN        ##
+    ######################################
+    # masks over the test set: whether each classifier is right, and whether
+    # the 1nan of each element is in S (iff x is in A, else x is in B)
+    with prof.stage('testLoop'):
+        y = testSet.labels
+        # 1nn(S, X)
+        okNnS = S.labels[nnS] == y
+        # 1nan(S, X) ( = 1nn(AE, X))
+        okNanMV = AEMV.labels[nnAEMV] == y
+        # 1nn(AE*MV, X) (always wrong if AE*MV is empty)
+        if AEStarMV:
+            okNnAEStarMV = AEStarMV.labels[nnAEStarMV] == y
+        else:
+            okNnAEStarMV = np.zeros(len(y), dtype=bool)
+        inA = AEMV.isin(S)[nnAEMV]
 
         ######################################
         ## COMPUTATION OF CURRENT ACCURACIES #
         ######################################
-        # compute accuracies
-        currentAccNanMV = float(nOKnanMV) / float((nOKnanMV + nKOnanMV))
-        currentAccNnS = float(nOKnnS) / float((nOKnnS + nKOnnS))
-        currentAccNnAEStarMV = float(nOKnnAEStarMV) / float((nOKnnAEStarMV +
-                               nKOnnAEStarMV))
+        currentAccNanMV = float(okNanMV.mean())
+        currentAccNnS = float(okNnS.mean())
+        currentAccNnAEStarMV = float(okNnAEStarMV.mean())
 
         # theoretical accuracy 1
         currentAccNanThry1MV = (currentAccNnS * currentLambdaMV +
                                 currentAccNnAEStarMV * (1. - currentLambdaMV))
         currentErr1MV = abs(currentAccNanMV - currentAccNanThry1MV)
 
-        # theoretical accuracy 2
-        try:
-            currentAccNnSAMV = float(nOKnnSAMV) / float(nOKnnSAMV + nKOnnSAMV)
-        except ZeroDivisionError:
-            currentAccNnSAMV = 0
-        try:
-            currentAccNnAEStarBMV = float(nOKnnAEStarBMV) / float(nOKnnAEStarBMV + nKOnnAEStarBMV)
-        except ZeroDivisionError:
-            currentAccNnAEStarBMV = 0
-
+        # theoretical accuracy 2: accuracies of 1nn(S, A) and 1nn(AE*MV, B)
+        currentAccNnSAMV = float(okNnS[inA].mean()) if inA.any() else 0
+        currentAccNnAEStarBMV = (float(okNnAEStarMV[~inA].mean())
+                                 if not inA.all() else 0)
         currentAccNanThry2MV = (currentAccNnSAMV * currentLambdaMV +
                                 currentAccNnAEStarBMV * (1. - currentLambdaMV))
         currentErr2MV = abs(currentAccNanMV - currentAccNanThry2MV)
 
         # theoretical accuracy 3
-        currentPropAMV = float(nOKnnSAMV + nKOnnSAMV) / len(testSet)
-        currentPropBMV = float(nOKnnAEStarBMV + nKOnnAEStarBMV) / len(testSet)
+        currentPropAMV = float(inA.mean())
+        currentPropBMV = float((~inA).mean())
         currentAccNanThry3MV = (currentAccNnSAMV * currentPropAMV +
                                 currentAccNnAEStarBMV * currentPropBMV)
         currentErr3MV = abs(currentAccNanMV - currentAccNanThry3MV)
 
-
-        #################################
-        ## UPDATE OF AVERAGE ACCURACIES #
-        #################################
-
-        avgAccNanMV += currentAccNanMV
-        avgAccNnS += currentAccNnS
-        avgAccNnAEStarMV += currentAccNnAEStarMV
-
-        avgAccNanThry1MV += currentAccNanThry1MV
-        avgErr1MV += currentErr1MV
-        avgAccNanThry2MV += currentAccNanThry2MV
-        avgErr2MV += currentErr2MV
-        avgAccNanThry3MV += currentAccNanThry3MV
-        avgErr3MV += currentErr3MV
-
-        avgLambdaMV += currentLambdaMV
-        avgWMV += currentWMV
-        avgWMVEst += currentWMVEst
-        avgGammaMV += currentGammaMV
-        avgPropAMV += currentPropAMV
-        avgPropBMV += currentPropBMV
-
-        print("m = {0:d} -- |U| = {1:d}".format(m, 2**m))
-        print("n = |S| = {0:d}".format(n))
-        print("|AEMV| = {0:d}".format(len(AEMV)))
-        print("acc nanMV(S, X)  : {0:.3f}".format(currentAccNanMV))
-        print("acc nn(S, X)     : {0:.3f}".format(currentAccNnS))
-        print("-" * 10)
-
-    # construct a dict with all the info and return it
-    infos  = {
-            'avgAccNanMV' : avgAccNanMV / n_exp,
-            'avgAccNnS' : avgAccNnS / n_exp,
-            'avgAccNnAEStarMV' : avgAccNnAEStarMV / n_exp,
-
-            'avgAccNanThry1MV' : avgAccNanThry1MV / n_exp,
-            'avgErr1MV' : avgErr1MV / n_exp,
-            'avgAccNanThry2MV' : avgAccNanThry2MV / n_exp,
-            'avgErr2MV' : avgErr2MV / n_exp,
-            'avgAccNanThry3MV' : avgAccNanThry3MV / n_exp,
-            'avgErr3MV' : avgErr3MV / n_exp,
-
-            'avgLambdaMV' : avgLambdaMV/ n_exp,
-            'avgWMV' : avgWMV / n_exp,
-            'avgWMVEst' : avgWMVEst / n_exp,
-            'avgGammaMV' : avgGammaMV / n_exp,
-            'avgPropAMV' : avgPropAMV / n_exp,
-            'avgPropBMV' : avgPropBMV /n_exp,
+    return {
+            'AccNanMV' : currentAccNanMV,
+            'AccNnS' : currentAccNnS,
+            'AccNnAEStarMV' : currentAccNnAEStarMV,
+
+            'AccNanThry1MV' : currentAccNanThry1MV,
+            'Err1MV' : currentErr1MV,
+            'AccNanThry2MV' : currentAccNanThry2MV,
+            'Err2MV' : currentErr2MV,
+            'AccNanThry3MV' : currentAccNanThry3MV,
+            'Err3MV' : currentErr3MV,
+
+            'LambdaMV' : currentLambdaMV,
+            'WMV' : currentWMV,
+            'WMVEst' : currentWMVEst,
+            'GammaMV' : currentGammaMV,
+            'PropAMV' : currentPropAMV,
+            'PropBMV' : currentPropBMV,
+
+            'sizeAEMV' : len(AEMV),
+            'profile' : prof.record(),
             }
 
+def printExperiment(m, n, res):
+    """print the main results of an experiment"""
+    print("m = {0:d} -- |U| = {1:d}".format(m, 2**m))
+    print("n = |S| = {0:d}".format(n))
+    print("|AEMV| = {0:d}".format(res['sizeAEMV']))
+    print("acc nanMV(S, X)  : {0:.3f}".format(res['AccNanMV']))
+    print("acc nn(S, X)     : {0:.3f}".format(res['AccNnS']))
     print("-" * 10)
 
-    # print dict on the way
-    for key, val in infos.items():
-        print(key.ljust(15) , "{0:.3f}".format(val))
+def aggregate(results, weights=None):
+    """return the infos dict: the average of each metric over the results of
+    all experiments (weighted by weights, if any)"""
 
+    # reminder: paper notation
+    # alpha = P(1nan(x) is in S with x in X); beta = P(1nan(x) is in AE* with x
+    # in X) = 1 - alpha.
+    # A = {x in X | 1nan(x) is in S}
+    # B = {x in X | 1nan(x) is in AE*}
+    # A inter B = 0, A union B = X
+    #
+    # AccNanMV: accuracy of nanMV(S, X) (= nanMV algorithm based on S evaluated
+    # on all elements of X)
+    # AccNnS: accuracy of nn(S, X) (= nn algorithm based on S evaluated on all
+    # elements of X)
+    # AccNnAEStarMV: accuracy of nn(AE*MV, X)
+    # theorertical accuracies: from roughest to most accurate
+    # AccNanThry1MV = acc(nn(S, X)) * lambda + acc(nn(AE*, X)) * (1 - lambda)
+    # AccNanThry2MV = acc(nn(S, A)) * lambda + acc(nn(AE*, B)) * (1 - lambda)
+    # AccNanThry3MV = acc(nn(S, A)) * |A| / |X| + acc(nn(AE*, B)) * |B| / |X|
+    # ErriMV: difference between acc(nanMV) and ith formula
+    # LambdaMV = |S| / |AEMV| (a quite rough approximation of alpha)
+    # WMV: omega = prop of correctly classified x in AE*MV
+    # WMVEst: estimation of omega
+    # GammaMV = |AEMV| / |X|
+    # PropAMV: proportion (over X) of elements in A (= alpha)
+    # PropBMV: proportion (over X) of elements in B (= beta)
+
+    table = metricsTable(results)
+    if weights is None:
+        avg = table.mean(axis=0)
+        # sample variance, and standard error of the average (unknown, as
+        # nan, with a single experiment)
+        if len(table) > 1:
+            var = table.var(axis=0, ddof=1)
+        else:
+            var = np.full(len(metricNames), np.nan)
+        ci = CI_Z * np.sqrt(var / len(table))
+    else:
+        # all training sets are evaluated (exact mode of sweep): averages
+        # are exact expectations, and variances are those of the metrics
+        weights = np.asarray(weights, dtype=float)
+        avg = np.average(table, axis=0, weights=weights)
+        var = np.average((table - avg)**2, axis=0, weights=weights)
+        ci = 0 * avg
+    infos = {}
+    for prefix, values in ('avg', avg), ('var', var), ('ci', ci):
+        infos.update((prefix + name, float(value)) for (name, value) in
+                     zip(metricNames, values))
     return infos
 
+def metricsTable(results):
+    """return the array of the metrics of the results of experiments: one
+    row per experiment, one column per metric of metricNames. Tables of
+    several runs are merged by concatenation."""
+    return np.array([[res[name] for name in metricNames] for res in results],
+                    dtype=float).reshape(len(results), len(metricNames))
+
+def converged(results, tol):
+    """return True if the standard error of the mean of each metric of
+    convergenceMetrics over results is at most tol"""
+    if len(results) < 2:
+        return False
+    table = metricsTable(results)
+    columns = [metricNames.index(name) for name in convergenceMetrics]
+    stderr = table[:, columns].std(axis=0, ddof=1) / np.sqrt(len(table))
+    return bool((stderr <= tol).all())
+
+def printInfos(infos):
+    """print the infos dict returned by main: the average of each metric,
+    with its confidence interval (if it is known)"""
+    print("-" * 10)
+    for name in metricNames:
+        line = "{0:.3f}".format(infos['avg' + name])
+        if not math.isnan(infos['ci' + name]):
+            line += " +- {0:.3f}".format(infos['ci' + name])
+        print(('avg' + name).ljust(15), line)
+
+def runTask(task):
+    """run the experiment(s) described by a tuple (m, n, f, seed, engine,
+    profile, testSize), where n is a list of sizes for nested experiments.
+    Return a dict n -> results."""
+    m, n, f, seed, engine, profile, testSize = task
+    if isinstance(n, list):
+        return nestedExperiment(m, n, f, seed, engine, profile, testSize)
+    return {n : experiment(m, n, f, seed, engine, profile, testSize)}
+
+def runIndexedTask(indexedTask):
+    """run the task of a pair (index, task) and return (index, results). Used
+    by the process pool, where tasks complete in any order."""
+    index, task = indexedTask
+    return index, runTask(task)
+
+def sweep(m, ns, n_exp, f=monk2, engine='python', seed=None, jobs=1,
+          nested=False, cache=None, cachedOnly=False, profileLog=None,
+          exact=False, tol=None, testSize=None, resultsLog=None,
+          onProgress=None):
+    """run n_exp experiments for each n in ns and return a dict n -> infos.
+    Values of n that are too big for the universe (or without any result when
+    cachedOnly is True) are left out.
+    Experiments are distributed over jobs processes. Since each experiment
+    has its own seed, the results do not depend on jobs.
+    If nested is True, the S of the ith experiment of each n are drawn from
+    the same shuffle of the universe, and AEMV is constructed incrementally
+    along the sweep.
+    If exact is True, the values of n that need at most n_exp (and
+    MAX_EXACT_EXPERIMENTS) experiments are not sampled: all training sets are
+    evaluated, in all orders (results depend on the order of S through the
+    tie-breaks), and infos are their exact averages. Only one training set
+    of each orbit under the symmetries of f is evaluated (see symmetry.py),
+    its results being weighted by the size of the orbit. Other values of n
+    are sampled as usual.
+    If tol is given, experiments are run by rounds of ROUND_SIZE, and a
+    value of n gets no more rounds once the standard error of its averages
+    of convergenceMetrics is at most tol (n_exp is then a maximum).
+    If testSize is given, experiments are evaluated on testSize random
+    elements of the universe (that are not in S) instead of all of them. It
+    is DEFAULT_TEST_SIZE by default for universes bigger than MAX_FULL_M,
+    which are never materialized.
+    If a ResultsCache is given, results found in it are not computed again,
+    and new results are stored in it as soon as they are available. If
+    cachedOnly is True, nothing is computed: infos are only built from the
+    cached results.
+    If profileLog is a file name, experiments that are run are profiled and
+    their records are appended to it (one JSON object per line).
+    If resultsLog is a file name, the results of the experiments that are
+    run are appended to it as soon as they are available (one JSON object
+    per line).
+    If onProgress is given, it is called each time results are available
+    with (done, total, partialInfos): the numbers of tasks done and planned,
+    and a function returning the dict n -> infos of the results so far.
+    The sweep can be cancelled with Ctrl-C: infos of the results obtained so
+    far are returned (and, with a cache, a new sweep resumes from them)."""
+
+    if seed is None:
+        seed = rd.getrandbits(32)
+    ns = [n for n in ns if n <= 2**m]
+    profile = profileLog is not None
+    if testSize is None and m > MAX_FULL_M:
+        testSize = DEFAULT_TEST_SIZE
+
+    # training sets (in each order) of the exact values of n, with their
+    # weights
+    exactSets = {}
+    # (the exact mode needs the whole universe as test set)
+    if exact and testSize is None:
+        maxExperiments = min(n_exp, MAX_EXACT_EXPERIMENTS)
+        # biggest group of symmetries whose orbits are affordable for each n
+        maxGroups = {}
+        for n in ns:
+            nSubsets = symmetry.nSubsets(2**m, n)
+            maxGroup = MAX_ORBIT_WORK // max(nSubsets, 2**m)
+            # there are at least nSubsets / len(group) orbits
+            if (nSubsets <= MAX_SUBSETS and maxGroup > 0 and
+                    nSubsets * math.factorial(n) <= maxExperiments * maxGroup):
+                maxGroups[n] = maxGroup
+    if exact and testSize is None and maxGroups:
+        U = getUniverse(m, f)
+        group = symmetry.symmetryGroup(U.labels, m, min(maxGroups.values()))
+        for n in maxGroups:
+            if (symmetry.nSubsets(len(U), n) * math.factorial(n) >
+                    maxExperiments * len(group)):
+                continue
+            reps, sizes = symmetry.orbits(group, n)
+            if len(reps) * math.factorial(n) > maxExperiments:
+                continue
+            exactSets[n] = ([order for rep in reps for order in
+                             itertools.permutations(rep)],
+                            [size for size in sizes for _ in
+                             range(math.factorial(n))])
+    sampledNs = [n for n in ns if n not in exactSets]
+
+    # results[n] = list of the results of the experiments with |S| = n, in the
+    # order of the experiments (None if not available)
+    results = {n : [None] * n_exp for n in sampledNs}
+    for n, (reps, sizes) in exactSets.items():
+        results[n] = [None] * len(reps)
+
+    # number of tasks done, and planned (less are done if tol stops them)
+    progress = {'done' : 0, 'total' : sum(len(reps) for (reps, sizes) in
+                                          exactSets.values())}
+    if sampledNs:
+        progress['total'] += n_exp * (1 if nested else len(sampledNs))
+
+    def infosOf(n):
+        """return the infos of the results of n so far (or None)"""
+        nResults = [res for res in results[n] if res is not None]
+        if not nResults:
+            return None
+        weights = None
+        if n in exactSets:
+            weights = [w for (w, res) in zip(exactSets[n][1], results[n])
+                       if res is not None]
+        return aggregate(nResults, weights)
+
+    def partialInfos():
+        infos = {n : infosOf(n) for n in ns}
+        return {n : nInfos for (n, nInfos) in infos.items()
+                if nInfos is not None}
+
+    def advance(nTasks):
+        progress['done'] += nTasks
+        if onProgress is not None:
+            onProgress(progress['done'], progress['total'], partialInfos)
+
+    def makeTasks(ns, exps):
+        """return the (exp, task) pairs of the experiments exps of each n in
+        ns (sampled ones)"""
+        if nested:
+            return [(exp, (m, ns, f, experimentSeed(seed, 'nested', exp),
+                           engine, profile, testSize)) for exp in exps]
+        # biggest experiments first, for a better load balance
+        return [(exp, (m, n, f, experimentSeed(seed, n, exp), engine,
+                       profile, testSize))
+                for n in sorted(ns, reverse=True) for exp in exps]
+
+    def taskKeys(task):
+        """return the dict n -> cache key of the results of a task"""
+        taskNs = task[1] if isinstance(task[1], list) else [task[1]]
+        return {n : cache.key(fid, m, n, task[3], testSize) for n in taskNs}
+
+    if cache is not None:
+        fid = functionId(f, m)
+
+    def store(tasks, index, taskResult):
+        exp, task = tasks[index]
+        for n, res in taskResult.items():
+            results[n][exp] = res
+        if cache is not None:
+            for n, key in taskKeys(task).items():
+                cache.put(key, taskResult[n])
+        if profile:
+            with open(profileLog, 'a') as log:
+                for n, res in taskResult.items():
+                    record = {'m' : m, 'n' : n, 'f' : f.__name__,
+                              'seed' : task[3], 'engine' : engine}
+                    record.update(res['profile'])
+                    log.write(json.dumps(record) + '\n')
+        if resultsLog is not None:
+            with open(resultsLog, 'a') as log:
+                for n, res in taskResult.items():
+                    record = {'m' : m, 'n' : n, 'f' : f.__name__,
+                              'seed' : task[3], 'engine' : engine,
+                              'testSize' : testSize}
+                    record.update((k, v) for (k, v) in res.items()
+                                  if k != 'profile')
+                    log.write(json.dumps(record) + '\n')
+        advance(1)
+
+    def run(tasks, pool):
+        """run the tasks (exp, task) that are not in the cache"""
+        todo = [] # indices of the tasks that need to be run
+        for index, (exp, task) in enumerate(tasks):
+            if cache is not None:
+                cached = {n : cache.get(key) for (n, key) in
+                          taskKeys(task).items()}
+                if None not in cached.values():
+                    for n, res in cached.items():
+                        results[n][exp] = res
+                    continue
+            todo.append(index)
+        if len(todo) < len(tasks):
+            advance(len(tasks) - len(todo))
+
+        if cachedOnly:
+            if todo:
+                print("Warning: {0:d} of {1:d} tasks are not in the "
+                      "cache".format(len(todo), len(tasks)))
+            return
+
+        indexedTasks = [(index, tasks[index][1]) for index in todo]
+        if pool is not None:
+            for index, taskResult in pool.imap_unordered(runIndexedTask,
+                                                         indexedTasks):
+                store(tasks, index, taskResult)
+        else:
+            for indexedTask in indexedTasks:
+                store(tasks, *runIndexedTask(indexedTask))
+
+    pool = shared = None
+    cancelled = False
+    try:
+        if jobs > 1 and not cachedOnly:
+            initializer, initargs = None, ()
+            if testSize is None or m <= MAX_TABLE_M:
+                # the tables of the universe are put in shared memory,
+                # workers attach to them instead of building their own copy
+                shared = SharedUniverse(getUniverse(m, f),
+                                        withCodes=testSize is None)
+                initializer, initargs = attachUniverse, (shared.handle(),)
+            pool = multiprocessing.Pool(jobs, initializer, initargs)
+
+        # exact values of n: S is given by the representative of an orbit
+        # (in one of its orders)
+        run([(exp, (m, n, f, rep, engine, profile, testSize))
+             for (n, (reps, sizes)) in exactSets.items()
+             for (exp, rep) in enumerate(reps)], pool)
+
+        step = n_exp if tol is None else ROUND_SIZE
+        active = sampledNs
+        for start in range(0, n_exp, step):
+            if not active:
+                break
+            run(makeTasks(active, range(start, min(start + step, n_exp))),
+                pool)
+            if tol is not None:
+                active = [n for n in active if not converged(
+                          [res for res in results[n] if res is not None], tol)]
+    except KeyboardInterrupt:
+        cancelled = True
+        if pool is not None:
+            pool.terminate()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if shared is not None:
+            shared.close()
+    if cancelled:
+        print("Warning: sweep cancelled after {0:d} of {1:d} tasks".format(
+              progress['done'], progress['total']))
+
+    allInfos = {}
+    for n in ns:
+        nResults = [res for res in results[n] if res is not None]
+        if not nResults:
+            continue
+        if n in exactSets:
+            print("m = {0:d} -- n = |S| = {1:d}: {2:d} training sets "
+                  "evaluated exactly".format(m, n, len(nResults)))
+        else:
+            for res in nResults:
+                printExperiment(m, n, res)
+        allInfos[n] = infosOf(n)
+        printInfos(allInfos[n])
+
+    return allInfos
+
+def main(m, n, n_exp, f=monk2, engine='python', seed=None, jobs=1):
+    """run n_exp experiments with |S| = n and return the infos dict"""
+
+    if n > 2**m:
+        raise Sn_Too_Small
+
+    return sweep(m, [n], n_exp, f, engine, seed, jobs)[n]
+
 
 if __name__ == "__main__":
     # execute only if run as a script
-    if len(sys.argv) != 4:
-        print("usage : python accuracy m n n_exp")
+    if len(sys.argv) not in (4, 5):
+        print("usage : python accuracy m n n_exp [engine]")
         exit(1)
     m = int(sys.argv[1])
     n = int(sys.argv[2])
     n_exp = int(sys.argv[3])
-    main(m, n, n_exp)
+    engine = sys.argv[4] if len(sys.argv) == 5 else 'python'
+    main(m, n, n_exp, engine=engine)
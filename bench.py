@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+'''Benchmark of the stages of the NaN pipeline (construction of AEMV,
+estimation of omega, both of them fused, 1nn search, batch prediction of a
+fitted AnalogicalClassifier and whole experiments)
+for each engine, over a grid of dimensions m and sizes n of S. Results are
+stored in a JSON file, and can be compared to those of a previous run to
+detect regressions.'''
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import accuracy
+from classifier import AnalogicalClassifier
+from functions import functions
+from universe import getUniverse
+
+def sample(m, n, f, seed):
+    """return (S, testSet): a random S of size n and the rest of the
+    universe (as Datasets)"""
+    U = getUniverse(m, f)
+    order = accuracy.shuffledIndices(len(U), seed)
+    return U.dataset.take(order[:n]), U.dataset.take(order[n:])
+
+def stages(engine, m, n, f, names):
+    """return the dict stage name -> (function to time, amount of work done
+    by one call, unit of the work) of the stages of given names"""
+    e = accuracy.engines[engine]
+    S, testSet = sample(m, n, f, 0)
+    # the classifier is fitted (AEMV constructed) only if it is timed
+    if 'predict' in names:
+        classifier = AnalogicalClassifier(e).fit(S)
+
+    def runMain():
+        with contextlib.redirect_stdout(io.StringIO()):
+            accuracy.main(m, n, 1, f, engine, seed=0)
+
+    allStages = {
+            'constructAEMV' : (lambda: e.constructAEMV(S), n**3, 'triplets'),
+            'getOmegaMVEst' : (lambda: e.getOmegaMVEst(S), n**3, 'triplets'),
+            'fused' : (lambda: e.constructAEMVWithOmegaEst(S), n**3,
+                       'triplets'),
+            'nn' : (lambda: e.nnBatch(testSet, S), len(testSet), 'queries'),
+            'predict' : (lambda: classifier.predict(testSet), len(testSet),
+                         'queries'),
+            'main' : (runMain, 1, 'experiments'),
+            }
+    return {name : allStages[name] for name in allStages if name in names}
+
+def measure(func, repeat):
+    """return (best time of repeat calls of func, peak memory of a call in
+    bytes). Memory is measured on a separate call since tracing slows it
+    down."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+def run(args):
+    """run the benchmark and return the list of results"""
+    f = functions[args.fname]
+    results = []
+    for engine in args.engines:
+        for m in args.m:
+            # stages whose last measure was too long are not run for bigger n
+            tooLong = set()
+            for n in args.n:
+                if n > 2**m:
+                    continue
+                names = [stage for stage in args.stages
+                         if stage not in tooLong]
+                for stage, (func, work, unit) in stages(engine, m, n, f,
+                                                        names).items():
+                    seconds, peak = measure(func, args.repeat)
+                    if seconds > args.maxTime:
+                        tooLong.add(stage)
+                    results.append({
+                        'stage' : stage,
+                        'engine' : engine,
+                        'm' : m,
+                        'n' : n,
+                        'seconds' : seconds,
+                        'throughput' : work / seconds,
+                        'unit' : unit + '/s',
+                        'peakMB' : peak / 2**20,
+                        })
+                    print('{stage:15} {engine:8} m={m:<3d} n={n:<5d} '
+                          '{seconds:9.4f}s {throughput:12.4g} {unit:14} '
+                          '{peakMB:8.1f}MB'.format(**results[-1]))
+    return results
+
+def compare(results, baseline, tolerance):
+    """print the results that are slower than in baseline by more than
+    tolerance (relative), and return their number"""
+    key = lambda r: (r['stage'], r['engine'], r['m'], r['n'])
+    old = {key(r) : r for r in baseline}
+    nRegressions = 0
+    for r in results:
+        if key(r) not in old:
+            continue
+        ratio = r['seconds'] / old[key(r)]['seconds']
+        if ratio > 1 + tolerance:
+            nRegressions += 1
+            print('REGRESSION {0} {1} m={2} n={3}: {4:.4f}s -> {5:.4f}s '
+                  '(x{6:.2f})'.format(*key(r), old[key(r)]['seconds'],
+                                      r['seconds'], ratio))
+    return nRegressions
+
+if __name__ == "__main__":
+    allStages = ['constructAEMV', 'getOmegaMVEst', 'fused', 'nn', 'predict',
+                 'main']
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-m', type=int, nargs='+',
+                        default=[4, 6, 8, 10, 12, 14, 16],
+                        help='dimensions of the universe. Default is 4 to 16.',
+                        metavar='<dimension>')
+    parser.add_argument('-n', type=int, nargs='+',
+                        default=[3, 10, 30, 100, 300, 1000],
+                        help='sizes of S. Default is 3 to 1000.',
+                        metavar='<size>')
+    parser.add_argument('-engines', type=str, nargs='+',
+                        default=list(accuracy.engines),
+                        choices=accuracy.engines, metavar='<engine>',
+                        help='engines to benchmark. Default is all of them.')
+    parser.add_argument('-stages', type=str, nargs='+', default=allStages,
+                        choices=allStages, metavar='<stage>',
+                        help='stages to benchmark: ' + ', '.join(allStages) +
+                        '. Default is all of them.')
+    parser.add_argument('-fname', type=str, default='monk2',
+                        choices=functions, metavar='<function name>',
+                        help='target function. Default is monk2.')
+    parser.add_argument('-repeat', type=int, default=3,
+                        help='number of timed calls (the best one is kept). '
+                        'Default is 3.', metavar='<repeat>')
+    parser.add_argument('-maxTime', type=float, default=10.,
+                        help='a stage is not run for bigger sizes of S once '
+                        'it takes more than this (in seconds). Default is 10.',
+                        metavar='<seconds>')
+    parser.add_argument('-out', type=str, default='bench.json',
+                        help='file where results are stored. Default is ' +
+                        'bench.json.', metavar='<file>')
+    parser.add_argument('-baseline', type=str, default=None,
+                        help='results of a previous run to compare with.',
+                        metavar='<file>')
+    parser.add_argument('-tolerance', type=float, default=.2,
+                        help='relative slowdown wrt the baseline that is ' +
+                        'reported as a regression. Default is 0.2.',
+                        metavar='<tolerance>')
+    args = parser.parse_args()
+
+    results = run(args)
+    with open(args.out, 'w') as f:
+        json.dump({
+            'python' : platform.python_version(),
+            'numpy' : np.__version__,
+            'machine' : platform.machine(),
+            'date' : time.strftime('%Y-%m-%d %H:%M:%S'),
+            'results' : results,
+            }, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,384 @@
+""" Bit-packed NumPy versions of the tools. Same interface (and same results)
+as their counterparts in tools.py, but triplets are processed by whole blocks
+instead of one by one.
+
+Elements are boolean vectors with their class as last entry. Each element is
+encoded as an integer whose bits are the components of the vector, the class
+being the lowest bit. With this encoding, a:b::c:d (for all components,
+class included) is solvable iff (a ^ b) & (a ^ c) == 0, and d = a ^ b ^ c."""
+
+import numpy as np
+
+from dataset import Dataset
+
+# number of bits set in each byte, for popcount on old versions of numpy
+BYTE_POPCOUNT = np.array([bin(x).count('1') for x in range(256)],
+                         dtype=np.uint8)
+
+# a triplet of indices (i, j, k) of S is packed into the integer
+# i << 2 * POS_BITS | j << POS_BITS | k so that comparing packed positions is
+# the same as comparing their order of appearance in tools.tripletGenerator
+POS_BITS = 21
+
+# default number of triplets processed at once. Memory used for the
+# construction of the extension sets is proportional to it (about 100 bytes
+# per triplet), whatever the size of S.
+CHUNK_SIZE = 1 << 20
+
+def encode(Sn):
+    """return the array of integer codes of the elements of Sn (class
+    included, as lowest bit). Sn is a list of elements or a Dataset"""
+    if isinstance(Sn, Dataset):
+        return Sn.full()
+    if not len(Sn):
+        return np.zeros(0, dtype=np.int64)
+    bits = np.array(Sn, dtype=np.int64)
+    weights = 1 << np.arange(bits.shape[1] - 1, -1, -1, dtype=np.int64)
+    return bits @ weights
+
+def decode(codes, m):
+    """return the list of boolean vectors (over m bits) coded by codes"""
+    shifts = np.arange(m - 1, -1, -1, dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    return ((codes[:, None] >> shifts) & 1).tolist()
+
+def nBitsOf(Sn):
+    """return the number of bits of the codes of the elements of Sn (class
+    included)"""
+    if isinstance(Sn, Dataset):
+        return Sn.m + 1
+    return len(Sn[0])
+
+def extend(S, elements):
+    """return S followed by elements (both lists or Datasets)"""
+    if isinstance(elements, Dataset):
+        return elements if not len(S) else S.concat(elements)
+    return list(S) + list(elements)
+
+def emptyLike(Sn):
+    """return an empty set of elements of the type of Sn (list or Dataset)"""
+    if isinstance(Sn, Dataset):
+        return Dataset(Sn.m, [], [])
+    return []
+
+def packPos(i, j, k):
+    """return the packed position of triplet (i, j, k)"""
+    return (i << 2 * POS_BITS) | (j << POS_BITS) | k
+
+def reduceVotes(keys, counts, firsts):
+    """merge entries of a vote table sharing the same key: counts are summed
+    and only the first position is kept. Return the table sorted by key."""
+    if not len(keys):
+        return keys, counts, firsts
+    order = np.lexsort((firsts, keys))
+    keys, counts, firsts = keys[order], counts[order], firsts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts, starts), firsts[starts]
+
+def emptyVotes():
+    """return an empty vote table"""
+    empty = np.zeros(0, dtype=np.int64)
+    return empty, empty, empty
+
+def mergeVotes(table, keys, firsts):
+    """return the vote table updated with one vote for each key"""
+    keys, counts, firsts = reduceVotes(keys, np.ones_like(keys), firsts)
+    return reduceVotes(np.concatenate((table[0], keys)),
+                       np.concatenate((table[1], counts)),
+                       np.concatenate((table[2], firsts)))
+
+def boxBlocks(I, J, K, chunkSize=None):
+    """Generator that yields the triplets of indices of I x J x K (three
+    ranges), in the order of tools.tripletGenerator, as arrays (i, j, k) of
+    at most chunkSize triplets"""
+    chunkSize = chunkSize or CHUNK_SIZE
+    size = len(I) * len(J) * len(K)
+    for start in range(0, size, chunkSize):
+        flat = np.arange(start, min(start + chunkSize, size), dtype=np.int64)
+        ij, k = np.divmod(flat, len(K))
+        i, j = np.divmod(ij, len(J))
+        yield I.start + i, J.start + j, K.start + k
+
+def tripletBlocks(n, chunkSize=None):
+    """Generator that yields the triplets of indices of S^3 (|S| = n), in the
+    order of tools.tripletGenerator, as arrays (i, j, k) of at most chunkSize
+    triplets. Memory used by the consumers of the blocks does not depend on
+    n."""
+    return boxBlocks(range(n), range(n), range(n), chunkSize)
+
+def solveBlocks(full, blocks):
+    """Generator that yields, for each block (i, j, k) of triplets of indices
+    of S, the arrays (i, j, k, d) of the triplets that are solvable along with
+    their solution d"""
+    for i, j, k in blocks:
+        a, b, c = full[i], full[j], full[k]
+        ok = ((a ^ b) & (a ^ c)) == 0
+        yield i[ok], j[ok], k[ok], (a ^ b ^ c)[ok]
+
+def isDistinct(i, j, k):
+    """return the mask of the triplets of indices without repeated elements"""
+    return (i != j) & (i != k) & (j != k)
+
+def tripletVotes(full, distinct=False, chunkSize=None):
+    """return the vote table (keys, counts, firsts) of the solvable triplets of
+    S: keys are the codes of the solutions d, counts the number of triplets
+    that lead to d and firsts the packed position of the first of them.
+    If distinct is True, triplets with repeated elements are skipped.
+    Triplets are processed by blocks of chunkSize."""
+    votes = emptyVotes()
+    for i, j, k, d in solveBlocks(full, tripletBlocks(len(full), chunkSize)):
+        if distinct:
+            keep = isDistinct(i, j, k)
+            i, j, k, d = i[keep], j[keep], k[keep], d[keep]
+        votes = mergeVotes(votes, d, packPos(i, j, k))
+    return votes
+
+def fusedVotes(full, blocks, votes, distinctVotes):
+    """return the vote tables votes and distinctVotes updated with the votes
+    of the solvable triplets of the blocks, all of them for votes and only
+    those of distinct elements for distinctVotes. Both tables are thus
+    updated in a single pass over the triplets."""
+    for i, j, k, d in solveBlocks(full, blocks):
+        firsts = packPos(i, j, k)
+        votes = mergeVotes(votes, d, firsts)
+        keep = isDistinct(i, j, k)
+        distinctVotes = mergeVotes(distinctVotes, d[keep], firsts[keep])
+    return votes, distinctVotes
+
+class IncrementalAEMV:
+    """Analogical extension of a sample set S that can grow: when new elements
+    are added, only the triplets involving at least one of them are solved.
+    The votes of both tripletVotes(S) and tripletVotes(S, distinct=True) are
+    maintained, so that AEMV and the estimation of omega are always those
+    of constructAEMV(S) and getOmegaMVEst(S)."""
+
+    def __init__(self, Sn=(), chunkSize=None):
+        self.S = []
+        self.full = np.zeros(0, dtype=np.int64)
+        self.votes = self.distinctVotes = emptyVotes()
+        self.chunkSize = chunkSize
+        self.add(Sn)
+
+    def add(self, elements, stats=None):
+        """add elements at the end of S and update the votes. If stats is a
+        dict, the number of triplets that were solved (and of solvable ones)
+        are stored in it."""
+        old = len(self.S)
+        nVotes = int(self.votes[1].sum())
+        self.S = extend(self.S, elements)
+        self.full = encode(self.S)
+        n = len(self.S)
+
+        # triplets with a new element: a is new, or a is old and b is new, or
+        # a and b are old and c is new
+        oldR, newR, allR = range(old), range(old, n), range(n)
+        boxes = [(newR, allR, allR), (oldR, newR, allR), (oldR, oldR, newR)]
+        for box in boxes:
+            blocks = boxBlocks(*box, chunkSize=self.chunkSize)
+            self.votes, self.distinctVotes = fusedVotes(
+                    self.full, blocks, self.votes, self.distinctVotes)
+
+        if stats is not None:
+            stats['triplets'] = n**3 - old**3
+            stats['solvable'] = int(self.votes[1].sum()) - nVotes
+
+    def constructAEMV(self):
+        """return AEMV of the current S (same as constructAEMV(S))"""
+        if not self.S:
+            return []
+        return extendWithVotes(self.S, *majorityVote(*self.votes))
+
+    def getOmegaMVEst(self):
+        """return the estimation of omega of the current S (same as
+        getOmegaMVEst(S))"""
+        return omegaEstWithVotes(self.full, self.distinctVotes)
+
+def majorityVote(keys, counts, firsts):
+    """return the arrays (features, classes) of the elements of a vote table
+    with their majority class, ordered by first vote. Ties are won by the
+    class that got its first vote first (as in tools.constructAEMV)"""
+    if not len(keys):
+        return keys, keys
+    feats = keys >> 1
+    order = np.lexsort((firsts, -counts, feats))
+    feats, keys, firsts = feats[order], keys[order], firsts[order]
+    starts = np.flatnonzero(np.r_[True, feats[1:] != feats[:-1]])
+    firstOfFeat = np.minimum.reduceat(firsts, starts)
+    order = np.argsort(firstOfFeat, kind='stable')
+    return feats[starts][order], (keys[starts] & 1)[order]
+
+def extendWithVotes(Sn, feats, classes):
+    """return Sn followed by the voted elements whose features are not in Sn
+    (as a Dataset if Sn is one)"""
+    new = ~np.isin(feats, encode(Sn) >> 1)
+    if isinstance(Sn, Dataset):
+        return Sn.concat(Dataset(Sn.m, feats[new], classes[new]))
+    m = len(Sn[0]) - 1
+    AE = [x for x in Sn]
+    AE.extend(x + [c] for (x, c) in zip(decode(feats[new], m),
+                                        classes[new].tolist()))
+    return AE
+
+def countVotes(votes, n, stats):
+    """fill the stats dict (if any) with the number of triplets of S^3
+    (|S| = n) and the number of those that voted in the vote table"""
+    if stats is not None:
+        stats['triplets'] = n**3
+        stats['solvable'] = int(votes[1].sum())
+
+def constructAEMV(Sn, chunkSize=None, stats=None):
+    """Return the analogical extension set of Sn where we a majority vote
+    procedure is applied for calculating the analogical labels
+    If stats is a dict, the number of triplets and of solvable triplets are
+    stored in it"""
+    if not Sn:
+        return emptyLike(Sn)
+    votes = tripletVotes(encode(Sn), chunkSize=chunkSize)
+    countVotes(votes, len(Sn), stats)
+    feats, classes = majorityVote(*votes)
+    return extendWithVotes(Sn, feats, classes)
+
+def constructAE(Sn, chunkSize=None):
+    """return the analogical extension set of the sample set Sn
+       we avoid ANY doubles, plus all elements of AE will be unique.
+       In the case where an element x of AE(Sn) has two
+       predicted classes, then we discard BOTH
+       Elements of Sn must have their class as last entry"""
+    if not Sn:
+        return emptyLike(Sn)
+    return extendWithoutDoubles(Sn, tripletVotes(encode(Sn),
+                                                 chunkSize=chunkSize))
+
+def extendWithoutDoubles(Sn, votes):
+    """return the elements of a vote table that got votes for only one class
+    (ordered by first vote), followed by the elements of Sn not already in
+    (as a Dataset if Sn is one)"""
+    keys, _, firsts = votes
+    # keys are sorted, so both classes of a same x are next to each other
+    feats = keys >> 1
+    double = np.zeros(len(keys), dtype=bool)
+    double[1:] = feats[1:] == feats[:-1]
+    double[:-1] |= double[1:]
+    keys = keys[~double][np.argsort(firsts[~double], kind='stable')]
+
+    if isinstance(Sn, Dataset):
+        # first occurrence of the elements of Sn that are not in AE yet
+        full = Sn.full()
+        rest = np.sort(np.unique(full, return_index=True)[1])
+        rest = rest[~np.isin(full[rest], keys)]
+        return Dataset.fromFull(keys, Sn.m).concat(Sn.take(rest))
+
+    m = len(Sn[0]) - 1
+    AESn = [x + [c] for (x, c) in zip(decode(keys >> 1, m),
+                                      (keys & 1).tolist())]
+    # elements from Sn might have been discarded (because of a double)
+    # we need to add them again
+    inAE = set(keys.tolist())
+    for x, code in zip(Sn, encode(Sn).tolist()):
+        if code not in inAE:
+            AESn.append(x)
+            inAE.add(code)
+    return AESn
+
+def constructAEMiclet(Sn, chunkSize=None):
+    """return the analogical extension set of the sample set Sn, Miclet style:
+    This means that we allow memebers of AEMSn not to be in B^n but in R^n.
+    Classes however stay in B."""
+    if not Sn:
+        return []
+    if isinstance(Sn, Dataset):
+        # elements of AEMiclet are not all in {0, 1}^m: lists are returned
+        Sn = Sn.toLists()
+    n, m = len(Sn), len(Sn[0]) - 1
+    X = np.array([x[:-1] for x in Sn], dtype=np.int64)
+    y = np.array([x[-1] for x in Sn], dtype=np.int64)
+    # components of d are in {0, 1, 2}: they are packed with two bits each
+    weights = 1 << (2 * np.arange(m - 1, -1, -1, dtype=np.int64))
+
+    # blocks are smaller since each triplet needs m integers here
+    chunkSize = max(1, (chunkSize or CHUNK_SIZE) // m)
+    votes = emptyVotes()
+    for i, j, k in tripletBlocks(n, chunkSize):
+        ok = (y[i] == y[j]) | (y[i] == y[k])
+        i, j, k = i[ok], j[ok], k[ok]
+        d = np.abs(X[k] - X[i] + X[j]) @ weights
+        dclass = np.where(y[i] == y[j], y[k], y[j])
+        votes = mergeVotes(votes, (d << 1) | dclass, packPos(i, j, k))
+    feats, classes = majorityVote(*votes)
+
+    new = ~np.isin(feats, X @ weights)
+    digits = (feats[new][:, None] >> (2 * np.arange(m - 1, -1, -1))) & 3
+    AEMiclet = [x for x in Sn]
+    AEMiclet.extend(x + [c] for (x, c) in zip(digits.tolist(),
+                                              classes[new].tolist()))
+    return AEMiclet
+
+def constructAEMVWithOmegaEst(Sn, chunkSize=None, stats=None,
+                              distinctStats=None):
+    """return (constructAEMV(Sn), getOmegaMVEst(Sn)), enumerating the
+    triplets of Sn only once. stats and distinctStats are those of
+    constructAEMV and getOmegaMVEst"""
+    if not Sn:
+        return emptyLike(Sn), 0
+    full = encode(Sn)
+    votes, distinctVotes = fusedVotes(full, tripletBlocks(len(Sn), chunkSize),
+                                      emptyVotes(), emptyVotes())
+    countVotes(votes, len(Sn), stats)
+    countVotes(distinctVotes, len(Sn), distinctStats)
+    return (extendWithVotes(Sn, *majorityVote(*votes)),
+            omegaEstWithVotes(full, distinctVotes))
+
+def getOmegaMVEst(Sn, chunkSize=None, stats=None):
+    """Return an estimation of Omega from Sn
+    If stats is a dict, the number of triplets and of solvable triplets (of
+    distinct elements) are stored in it"""
+    full = encode(Sn)
+    votes = tripletVotes(full, True, chunkSize)
+    countVotes(votes, len(Sn), stats)
+    return omegaEstWithVotes(full, votes)
+
+def omegaEstWithVotes(full, distinctVotes):
+    """return the estimation of omega of S (given by its codes full), from the
+    votes of the triplets of distinct elements of S"""
+    feats, classes = majorityVote(*distinctVotes)
+    predicted = dict(zip(feats.tolist(), classes.tolist()))
+
+    nOK = nKO = 0
+    for code in full.tolist():
+        if code >> 1 not in predicted: continue
+        if predicted[code >> 1] == code & 1:
+            nOK += 1
+        else:
+            nKO += 1
+
+    try:
+        estW = nOK / (nOK + nKO)
+    except ZeroDivisionError:
+        estW = 0
+
+    return estW
+
+def popcount(x):
+    """return the number of bits set in each element of the int64 array x"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    bytes_ = np.ascontiguousarray(x).view(np.uint8).reshape(x.shape + (8,))
+    return BYTE_POPCOUNT[bytes_].sum(axis=-1)
+
+def hammingNN(X, S, block=1 << 22):
+    """return the indices in S of the 1nn of each element of X, where X and S
+    are arrays of integer codes (without class). Queries are processed by
+    batches so that at most block distances are computed at once."""
+    X, S = np.asarray(X, dtype=np.int64), np.asarray(S, dtype=np.int64)
+    indices = np.zeros(len(X), dtype=np.int64)
+    step = max(1, block // max(1, len(S)))
+    for start in range(0, len(X), step):
+        dists = popcount(X[start:start + step, None] ^ S[None, :])
+        # argmin returns the first minimal item, as tools.nn does
+        indices[start:start + step] = dists.argmin(axis=1)
+    return indices
+
+def nnBatch(X, S):
+    """return the list of the indices in S of the 1nn of each element of X.
+    All elements of X and S have their class at the end."""
+    return hammingNN(encode(X) >> 1, encode(S) >> 1).tolist()
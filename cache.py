@@ -0,0 +1,70 @@
+""" On-disk cache of the results of the experiments. Results of an experiment
+only depend on the target function, m, n and the seed of the experiment (and
+on the code computing them), so they are stored in a file whose name is a hash
+of these. """
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+from universe import MAX_TABLE_M, getUniverse
+
+# to be bumped each time a change of the code changes the results of the
+# experiments, so that old results are not used anymore
+ENGINE_VERSION = 1
+
+def functionId(f, m):
+    """return an identifier of the boolean function f over m bits. It is a
+    hash of the truth table of f, so that two functions with different names
+    (or two versions of a same function) are the same iff they have the same
+    values. Above MAX_TABLE_M, the truth table is too big: the labels of a
+    fixed random sample of the universe are used instead."""
+    U = getUniverse(m, f)
+    if m <= MAX_TABLE_M:
+        table = U.labels.tobytes()
+    else:
+        codes = np.random.default_rng(0).integers(0, len(U), 1 << 16)
+        table = U.labelsOf(codes).tobytes()
+    return hashlib.sha1(table).hexdigest()
+
+class ResultsCache:
+    """Directory where each experiment result is pickled in its own file"""
+
+    def __init__(self, path='./cache'):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def key(self, fid, m, n, seed, testSize=None):
+        """return the key of the experiment with |S| = n and given seed, for
+        the function of identifier fid over m bits (evaluated on testSize
+        random elements, if given)"""
+        desc = repr((fid, m, n, seed, ENGINE_VERSION))
+        if testSize is not None:
+            desc = repr((fid, m, n, seed, testSize, ENGINE_VERSION))
+        return hashlib.sha1(desc.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pkl')
+
+    def __contains__(self, key):
+        return os.path.exists(self._file(key))
+
+    def get(self, key):
+        """return the results stored with key, or None"""
+        try:
+            with open(self._file(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, res):
+        """store the results res with key"""
+        # results are written in a temporary file first so that an
+        # interruption never leaves a truncated file in the cache
+        tmp = self._file(key) + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(res, f)
+        os.replace(tmp, self._file(key))
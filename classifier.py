@@ -0,0 +1,141 @@
+""" NaN classifier as a reusable object: the analogical extension AEMV of a
+training set is constructed once (fit), and the class of any element x is
+then the class of its nn in AEMV for the hamming distance (predict), as in
+the test loop of accuracy.evaluate.
+
+Elements of AEMV are indexed by their code: exact hits are found by a lookup,
+and the others by looking up the codes of increasing hamming balls around x,
+until the balls get bigger than AEMV itself (the nn is then searched by
+brute force). Ties are broken as in tools.nn: the first minimal element of
+AEMV is the nn. """
+
+import itertools
+import math
+
+import numpy as np
+
+import bittools as bt
+import lattice
+from dataset import Dataset
+from universe import MAX_TABLE_M
+
+class AnalogicalClassifier:
+    """Classifier predicting the class of the nn of an element in the
+    analogical extension of the training set. engine is the module used to
+    construct the extension (see accuracy.engines)."""
+
+    def __init__(self, engine=lattice):
+        self.engine = engine
+        self.m = None
+        self.extension = None
+
+    def fit(self, S):
+        """construct the extension of the training set S (a list of elements
+        with their class at the end, or a Dataset) and index it. Return
+        self."""
+        if not isinstance(S, Dataset):
+            S = Dataset.fromLists(S, len(S[0]) - 1)
+        return self.fitExtension(self.engine.constructAEMV(S))
+
+    def fitExtension(self, AEMV):
+        """index an already constructed extension (a Dataset). Return self."""
+        self.m = AEMV.m
+        self.extension = AEMV
+        codes = AEMV.codes
+        if self.m <= MAX_TABLE_M:
+            # table[code] is the index of the first element of code code
+            self.table = np.full(2**self.m, -1, dtype=np.int64)
+            self.table[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+        else:
+            # first elements of each code are the first of their run
+            self.order = np.argsort(codes, kind='stable')
+            self.sortedCodes = codes[self.order]
+
+        # masks[r - 1] holds the codes of weight r. Balls are searched as long
+        # as they are smaller than AEMV.
+        self.masks = []
+        size = 1
+        for r in range(1, self.m + 1):
+            size += math.comb(self.m, r)
+            if size > len(codes):
+                break
+            self.masks.append(np.array([sum(1 << i for i in bits) for bits in
+                                        itertools.combinations(range(self.m),
+                                                               r)],
+                                       dtype=np.int64))
+        return self
+
+    def lookup(self, codes):
+        """return the array of the indices of the first element of AEMV of
+        each code (-1 if there is none)"""
+        if self.m <= MAX_TABLE_M:
+            return self.table[codes]
+        pos = np.searchsorted(self.sortedCodes, codes)
+        pos = np.minimum(pos, len(self.sortedCodes) - 1)
+        found = self.sortedCodes[pos] == codes
+        return np.where(found, self.order[pos], -1)
+
+    def codesOf(self, X):
+        """return the array of the codes of X: a Dataset, a list (or 2d
+        array) of elements without their class, or an array of codes"""
+        if isinstance(X, Dataset):
+            return X.codes
+        X = np.asarray(X, dtype=np.int64)
+        if X.ndim == 2:
+            return X @ (1 << np.arange(self.m - 1, -1, -1, dtype=np.int64))
+        return X
+
+    def neighbours(self, X, block=1 << 22):
+        """return the array of the indices in AEMV of the nn of each element
+        of X (see codesOf). Queries are processed by batches so that at most
+        block lookups are done at once."""
+        if self.extension is None:
+            raise ValueError('classifier is not fitted')
+        codes = self.codesOf(X)
+        nn = np.zeros(len(codes), dtype=np.int64)
+        if not len(codes):
+            return nn
+        if not len(self.extension):
+            raise ValueError('extension is empty')
+        biggest = max([len(masks) for masks in self.masks] + [1])
+        step = max(1, block // biggest)
+        for start in range(0, len(codes), step):
+            nn[start:start + step] = self._neighbours(codes[start:start +
+                                                            step])
+        return nn
+
+    def _neighbours(self, codes):
+        """return the indices in AEMV of the nn of each code (a batch)"""
+        nn = self.lookup(codes)
+        todo = np.flatnonzero(nn < 0)
+        for masks in self.masks:
+            if not len(todo):
+                return nn
+            hits = self.lookup(codes[todo, None] ^ masks[None, :])
+            # the first element of AEMV among the hits of the ball
+            hits = np.where(hits >= 0, hits, len(self.extension)).min(axis=1)
+            found = hits < len(self.extension)
+            nn[todo[found]] = hits[found]
+            todo = todo[~found]
+        if len(todo):
+            nn[todo] = bt.hammingNN(codes[todo], self.extension.codes)
+        return nn
+
+    def predict(self, X):
+        """return the array of the classes (0 or 1) predicted for the
+        elements of X (see codesOf)"""
+        return self.extension.labels[self.neighbours(X)]
+
+    def save(self, path):
+        """store the extension in the file path (as .npz)"""
+        if self.extension is None:
+            raise ValueError('classifier is not fitted')
+        np.savez(path, m=self.m, codes=self.extension.codes,
+                 labels=self.extension.labels)
+
+    @classmethod
+    def load(cls, path, engine=lattice):
+        """return the classifier stored in the file path by save"""
+        with np.load(path) as data:
+            AEMV = Dataset(int(data['m']), data['codes'], data['labels'])
+        return cls(engine).fitExtension(AEMV)
@@ -0,0 +1,106 @@
+""" Compact representation of sets of elements of {0, 1}^m with their class:
+an array of integer codes (the features, as in tools.bitfield) and a separate
+array of labels, instead of a list of lists with the class at the end. """
+
+import numpy as np
+
+import tools as t
+
+class Dataset:
+    """Elements of {0, 1}^m: codes[i] is the integer code of the ith element
+    and labels[i] its class (0 or 1)"""
+
+    __slots__ = ('m', 'codes', 'labels')
+
+    def __init__(self, m, codes, labels):
+        self.m = m
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.uint8)
+
+    @classmethod
+    def fromLists(cls, elements, m):
+        """return the Dataset of a list of elements (with their class at the
+        end)"""
+        codes = [t.toCode(x[:-1]) for x in elements]
+        labels = [bool(x[-1]) for x in elements]
+        return cls(m, codes, labels)
+
+    @classmethod
+    def fromFull(cls, full, m):
+        """return the Dataset of the full codes (class as lowest bit) of its
+        elements, as in bittools"""
+        full = np.asarray(full, dtype=np.int64)
+        return cls(m, full >> 1, full & 1)
+
+    def toLists(self):
+        """return the list of the elements (with their class at the end)"""
+        shifts = np.arange(self.m - 1, -1, -1, dtype=np.int64)
+        bits = (self.codes[:, None] >> shifts) & 1
+        return np.column_stack((bits, self.labels)).tolist()
+
+    def full(self):
+        """return the full codes of the elements: the class is added as lowest
+        bit, as in bittools"""
+        return (self.codes << 1) | self.labels
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __eq__(self, other):
+        return (isinstance(other, Dataset) and self.m == other.m and
+                np.array_equal(self.codes, other.codes) and
+                np.array_equal(self.labels, other.labels))
+
+    def take(self, indices):
+        """return the Dataset of the elements of given indices (or mask)"""
+        return Dataset(self.m, self.codes[indices], self.labels[indices])
+
+    def concat(self, other):
+        """return the Dataset of the elements of self followed by those of
+        other"""
+        return Dataset(self.m, np.concatenate((self.codes, other.codes)),
+                       np.concatenate((self.labels, other.labels)))
+
+    def isin(self, other):
+        """return the mask of the elements (class included) that are in
+        other"""
+        return np.isin(self.full(), other.full())
+
+    def without(self, other):
+        """return the elements that are not in other (e.g. AE* = AE \\ S)"""
+        return self.take(~self.isin(other))
+
+def getOmega(AEStar, trueLabels):
+    """return proportion of correctly classified elements in AEStar, where
+    trueLabels[i] is the true class of its ith element. Same as
+    tools.getOmega"""
+    if not len(AEStar):
+        print("Warning: AE* is empty!")
+        return 0
+    return float(np.mean(trueLabels == AEStar.labels))
+
+class ListEngine:
+    """Engine working on Datasets, built from an engine working on lists of
+    elements (tools.py): Datasets are converted to lists, and the extension
+    sets it returns are converted back to Datasets"""
+
+    def __init__(self, module):
+        self.module = module
+
+    def constructAEMV(self, Sn, **kwargs):
+        AEMV = self.module.constructAEMV(Sn.toLists(), **kwargs)
+        return Dataset.fromLists(AEMV, Sn.m)
+
+    def getOmegaMVEst(self, Sn, **kwargs):
+        return self.module.getOmegaMVEst(Sn.toLists(), **kwargs)
+
+    def constructAEMVWithOmegaEst(self, Sn, **kwargs):
+        AEMV, estW = self.module.constructAEMVWithOmegaEst(Sn.toLists(),
+                                                           **kwargs)
+        return Dataset.fromLists(AEMV, Sn.m), estW
+
+    def constructAE(self, Sn):
+        return Dataset.fromLists(self.module.constructAE(Sn.toLists()), Sn.m)
+
+    def nnBatch(self, X, S):
+        return self.module.nnBatch(X.toLists(), S.toLists())
@@ -0,0 +1,89 @@
+""" Boolean functions used as target functions in the experiments. The class
+of an element x (without its class) is f(x).
+
+Functions are defined by their array form, taking a 2d array of bits (one
+element per row, its components as columns) and returning the array of the
+classes of the elements, so that a whole universe or extension set is
+labelled at once. The per-element form f(x) is derived from it.
+
+They are registered by name in the functions dict, and are sent to the
+worker processes of accuracy.sweep by name. """
+
+import numpy as np
+
+class TargetFunction:
+    """Boolean function over {0, 1}^m given by its array form vectorized"""
+
+    def __init__(self, name, vectorized):
+        self.__name__ = name
+        self.__doc__ = vectorized.__doc__
+        self.vectorized = vectorized
+
+    def __call__(self, x):
+        """return the class of the element x (without its class)"""
+        return bool(self.vectorized(np.array([x], dtype=np.int64))[0])
+
+    def labels(self, bits):
+        """return the array of the classes (as 0 or 1) of the elements that
+        are the rows of the 2d array bits"""
+        return np.asarray(self.vectorized(bits), dtype=bool).astype(np.uint8)
+
+    def __reduce__(self):
+        return (getFunction, (self.__name__,))
+
+    def __repr__(self):
+        return 'TargetFunction({0!r})'.format(self.__name__)
+
+functions = {}
+
+def register(name):
+    """decorator registering the array form of a function under name. The
+    decorated name is bound to the TargetFunction."""
+    def decorator(vectorized):
+        functions[name] = TargetFunction(name, vectorized)
+        return functions[name]
+    return decorator
+
+def getFunction(name):
+    """return the registered function of given name"""
+    return functions[name]
+
+@register('monk2')
+def monk2(X):
+    """MONK2: exactly two components are 1"""
+    return X.sum(axis=1) == 2
+
+@register('isEven')
+def isEven(X):
+    """class is true if x is even"""
+    return X[:, -1] == 1
+
+@register('kOfm')
+def kOfm(X):
+    """at least half of the components are 1"""
+    return X.sum(axis=1) >= X.shape[1] / 2
+
+@register('xor')
+def xor(X):
+    return X[:, -1] ^ X[:, -2]
+
+@register('or')
+def or_(X):
+    return X[:, -1] | X[:, -2]
+
+@register('and')
+def and_(X):
+    return X[:, -1] & X[:, -2]
+
+@register('andFourLast')
+def andFourLast(X):
+    return X[:, -1] & X[:, -2] & X[:, -3] & X[:, -4]
+
+@register('firstAndLast')
+def firstAndLast(X):
+    return X[:, 0] & X[:, -1]
+
+@register('monkAllButOne')
+def monkAllButOne(X):
+    """all components but one are 1"""
+    return X.sum(axis=1) == X.shape[1] - 1
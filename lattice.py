@@ -0,0 +1,315 @@
+""" Analogical extension of S computed by counting the votes of each element d
+of the universe {0, 1}^m, instead of solving every triplet of S^3.
+
+With the codes of bittools (class included, as lowest bit), a:b::c:d is
+solvable iff a and b agree wherever b and c agree, and then d = a ^ b ^ c.
+So the triplets voting for d are the (a, b, c) such that the pair (b, c) has
+the signature (w, a & ~w), where w = a ^ d and the signature of (b, c) is
+(b ^ c, b & ~(b ^ c)). Once the signatures of the n^2 pairs of S are counted,
+the votes for d are a sum of n lookups, and all votes are obtained in
+O(n^2 + 2^m * n) instead of O(n^3).
+
+The pairs of S are computed once per training set in a PairIndex, which all
+the functions of this module accept (as index) so that it can be shared.
+
+Same interface (and same results) as tools.py and bittools.py. Elements of S
+are supposed distinct (as when they are drawn from the universe)."""
+
+import functools
+
+import numpy as np
+
+import bittools as bt
+# engine interface: these ones are not computed on the lattice
+from bittools import constructAEMiclet, nnBatch
+
+class PairIndex:
+    """Pairs (b, c) = (S[j], S[k]) of S^2, grouped by the xor w of their
+    features. Pairs are sorted by key, where the key of (b, c) is its
+    signature on features (w, b & ~w) followed by the classes of b and c (as
+    two lowest bits): a triplet (a, b, c) with a:b::c:x is class solvable
+    unless both classes are those opposite to the class of a.
+    Sn is a list of elements or a Dataset."""
+
+    def __init__(self, Sn):
+        self.full = bt.encode(Sn)
+        self.nBits = bt.nBitsOf(Sn) if len(Sn) else 1
+        self.feats, self.labels = self.full >> 1, self.full & 1
+        n, nFeatBits = len(self.full), self.nBits - 1
+        j, k = np.divmod(np.arange(n * n, dtype=np.int64), n)
+        w = self.feats[j] ^ self.feats[k]
+        keys = (((w << nFeatBits | (self.feats[j] & ~w)) << 2) |
+                self.labels[j] << 1 | self.labels[k])
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.j, self.k = keys[order], j[order], k[order]
+
+    def __len__(self):
+        return len(self.full)
+
+    @functools.cached_property
+    def signatures(self):
+        """table (signatures, counts, firsts) of the signatures of the pairs
+        on the whole codes (class included): firsts is the first pair
+        (packed as j << POS_BITS | k) of each signature. Signatures are
+        sorted."""
+        nFeatBits = self.nBits - 1
+        featSigs, yb, yc = self.keys >> 2, (self.keys >> 1) & 1, self.keys & 1
+        w = featSigs >> nFeatBits
+        rest = featSigs & ((1 << nFeatBits) - 1)
+        # the class of b ^ c is yb ^ yc, and b & ~(b ^ c) keeps yb & yc
+        sigs = (((w << 1 | (yb ^ yc)) << self.nBits) | rest << 1 | (yb & yc))
+        return bt.reduceVotes(sigs, np.ones_like(sigs),
+                              (self.j << bt.POS_BITS) | self.k)
+
+    @functools.cached_property
+    def positions(self):
+        """index in S of each code of S"""
+        return {code : k for (k, code) in enumerate(self.full.tolist())}
+
+def latticeVotes(index, candidates=None, block=1 << 22):
+    """return the vote table (keys, counts, firsts) of the solvable triplets of
+    S (given by its PairIndex), like bittools.tripletVotes, restricted to the
+    given candidate solutions (all of {0, 1}^nBits by default). Candidates
+    are processed by batches so that at most block lookups are done at
+    once."""
+    full, nBits = index.full, index.nBits
+    if candidates is None:
+        candidates = np.arange(2**nBits, dtype=np.int64)
+    sigs, sigCounts, sigFirsts = index.signatures
+    # packed position of the first triplet (a, b, c) of each a
+    firstOfA = np.arange(len(full), dtype=np.int64) << 2 * bt.POS_BITS
+    never = np.iinfo(np.int64).max
+
+    keys, counts, firsts = [], [], []
+    step = max(1, block // max(1, len(full)))
+    for start in range(0, len(candidates), step):
+        d = candidates[start:start + step, None]
+        w = d ^ full[None, :]
+        sig = (w << nBits) | (full[None, :] & ~w)
+        idx = np.minimum(np.searchsorted(sigs, sig), len(sigs) - 1)
+        found = sigs[idx] == sig
+        count = np.where(found, sigCounts[idx], 0).sum(axis=1)
+        first = np.where(found, firstOfA | sigFirsts[idx], never).min(axis=1)
+        voted = count > 0
+        keys.append(d[voted, 0])
+        counts.append(count[voted])
+        firsts.append(first[voted])
+    return np.concatenate(keys), np.concatenate(counts), np.concatenate(firsts)
+
+def degenerateVotes(full):
+    """return the vote table of the solvable triplets of S with repeated
+    elements, i.e. those that getOmegaMVEst ignores"""
+    n = len(full)
+    i, x = np.divmod(np.arange(n * n, dtype=np.int64), n)
+    other = i != x
+    # (a, a, c), (a, b, a) and (a, b, b) with b != a
+    I = np.concatenate((i, i[other], i[other]))
+    J = np.concatenate((i, x[other], x[other]))
+    K = np.concatenate((x, i[other], x[other]))
+    a, b, c = full[I], full[J], full[K]
+    ok = ((a ^ b) & (a ^ c)) == 0
+    d = (a ^ b ^ c)[ok]
+    return bt.reduceVotes(d, np.ones_like(d), bt.packPos(I, J, K)[ok])
+
+def firstDistinctTriplet(index, d):
+    """return the packed position of the first solvable triplet of distinct
+    elements of S (given by its PairIndex) whose solution is d (or None)"""
+    full, n = index.full, len(index)
+    i, j = np.divmod(np.arange(n * n, dtype=np.int64), n)
+    a, b = full[i], full[j]
+    c = a ^ b ^ d
+    k = np.array([index.positions.get(code, -1) for code in c.tolist()],
+                 dtype=np.int64)
+    ok = ((k >= 0) & (((a ^ b) & (a ^ c)) == 0) & (i != j) & (i != k) &
+          (j != k))
+    if not ok.any():
+        return None
+    return bt.packPos(i[ok], j[ok], k[ok]).min()
+
+def constructAEMV(Sn, stats=None, index=None):
+    """Return the analogical extension set of Sn where we a majority vote
+    procedure is applied for calculating the analogical labels
+    If stats is a dict, the number of triplets and of solvable triplets are
+    stored in it. index is the PairIndex of Sn (built if not given)"""
+    if not Sn:
+        return bt.emptyLike(Sn)
+    votes = latticeVotes(PairIndex(Sn) if index is None else index)
+    bt.countVotes(votes, len(Sn), stats)
+    return bt.extendWithVotes(Sn, *bt.majorityVote(*votes))
+
+def constructAE(Sn, index=None):
+    """return the analogical extension set of the sample set Sn
+       we avoid ANY doubles, plus all elements of AE will be unique.
+       In the case where an element x of AE(Sn) has two
+       predicted classes, then we discard BOTH
+       Elements of Sn must have their class as last entry"""
+    if not Sn:
+        return bt.emptyLike(Sn)
+    votes = latticeVotes(PairIndex(Sn) if index is None else index)
+    return bt.extendWithoutDoubles(Sn, votes)
+
+def getOmegaMVEst(Sn, stats=None, index=None):
+    """Return an estimation of Omega from Sn
+    If stats is a dict, the number of triplets and of solvable triplets (of
+    distinct elements) are stored in it: all triplets are then solved, not
+    only those voting for elements of S. index is the PairIndex of Sn (built
+    if not given)"""
+    if not Sn:
+        countDistinctVotes(None, None, 0, stats)
+        return 0
+    index = PairIndex(Sn) if index is None else index
+    if stats is not None:
+        votes = latticeVotes(index)
+        countDistinctVotes(index, votes, len(Sn), stats)
+        return omegaEstWithVotes(index, votes)
+    full = index.full
+    # only votes for elements of S (with any class) are needed
+    candidates = np.unique(np.concatenate(((full >> 1) << 1,
+                                           (full >> 1) << 1 | 1)))
+    return omegaEstWithVotes(index, latticeVotes(index, candidates))
+
+def constructAEMVWithOmegaEst(Sn, stats=None, distinctStats=None,
+                              index=None):
+    """return (constructAEMV(Sn), getOmegaMVEst(Sn)). The votes of the
+    triplets of distinct elements are derived from those of all triplets,
+    which are only computed once. stats and distinctStats are those of
+    constructAEMV and getOmegaMVEst, index the PairIndex of Sn (built if not
+    given)"""
+    if not Sn:
+        countDistinctVotes(None, None, 0, distinctStats)
+        return bt.emptyLike(Sn), 0
+    index = PairIndex(Sn) if index is None else index
+    votes = latticeVotes(index)
+    bt.countVotes(votes, len(Sn), stats)
+    countDistinctVotes(index, votes, len(Sn), distinctStats)
+    return (bt.extendWithVotes(Sn, *bt.majorityVote(*votes)),
+            omegaEstWithVotes(index, votes))
+
+def countDistinctVotes(index, votes, n, stats):
+    """fill the stats dict (if any) with the number of triplets of S^3
+    (|S| = n) and the number of those of distinct elements that voted in
+    votes, the vote table of all the triplets of S (given by its
+    PairIndex)"""
+    if stats is not None:
+        stats['triplets'] = n**3
+        stats['solvable'] = 0
+        if n:
+            stats['solvable'] = int(votes[1].sum() -
+                                    degenerateVotes(index.full)[1].sum())
+
+def omegaEstWithVotes(index, votes):
+    """return the estimation of omega of S (given by its PairIndex) from the
+    votes of all triplets of S, which must at least hold the votes for the
+    elements of S (with both classes)"""
+    full = index.full
+    keys, counts, firsts = votes
+    # votes for other elements are useless (masking also copies the arrays,
+    # which are modified below)
+    inS = np.isin(keys >> 1, full >> 1)
+    keys, counts, firsts = keys[inS], counts[inS], firsts[inS]
+
+    # remove the votes of triplets with repeated elements
+    degKeys, degCounts, _ = degenerateVotes(full)
+    idx = np.searchsorted(keys, degKeys)
+    counts[idx] -= degCounts
+    voted = counts > 0
+    keys, counts, firsts = keys[voted], counts[voted], firsts[voted]
+
+    # firsts are only needed when both classes of an element get the same
+    # number of votes: those are computed directly
+    feats = keys >> 1
+    tied = np.flatnonzero(np.r_[feats[1:] == feats[:-1], False] &
+                          np.r_[counts[1:] == counts[:-1], False])
+    for t in np.concatenate((tied, tied + 1)).tolist():
+        firsts[t] = firstDistinctTriplet(index, keys[t])
+
+    return bt.omegaEstWithVotes(full, (keys, counts, firsts))
+
+def randomTriplets(X, Sn, rng=None, block=1 << 22, index=None):
+    """return the arrays (i, j, k) of the indices of a triplet (a, b, c) of Sn
+    such that a:b::c:x (classes ignored) and that is class solvable, for
+    each x of X: the first one of Sn^3 (as in tools.tripletGenerator) with Sn
+    shuffled anew for each x. Indices are -1 if there is no such triplet.
+    Queries are processed by batches so that at most block lookups are done
+    at once. index is the PairIndex of Sn (built if not given)"""
+    if rng is None:
+        rng = np.random.default_rng()
+    index = PairIndex(Sn) if index is None else index
+    feats, labels = index.feats, index.labels
+    n, nBits = len(feats), index.nBits - 1
+    queries = bt.encode(X) >> 1
+    keys = index.keys
+
+    I = np.full(len(queries), -1, dtype=np.int64)
+    J, K = I.copy(), I.copy()
+    if not n:
+        return I, J, K
+    step = max(1, block // max(1, n))
+    for start in range(0, len(queries), step):
+        x = queries[start:start + step, None]
+        w = x ^ feats[None, :]
+        sig = (w << nBits | (feats[None, :] & ~w)) << 2
+        # (b, c) with classes (1 - ya, 1 - ya) are the only ones that are not
+        # class solvable with a. Their keys are the last (ya = 0) or the
+        # first (ya = 1) of the signature, so the others are contiguous.
+        ya = labels[None, :]
+        lo = np.where(ya == 0, np.searchsorted(keys, sig),
+                      np.searchsorted(keys, sig, side='right'))
+        hi = np.where(ya == 0, np.searchsorted(keys, sig | 2, side='right'),
+                      np.searchsorted(keys, sig | 3, side='right'))
+        # rank[q, i] is the position of S[i] in the shuffle of Sn for query q
+        rank = rng.random(lo.shape).argsort(axis=1).argsort(axis=1)
+        # the first a that has valid pairs (b, c)
+        ranked = np.where(hi > lo, rank, n)
+        a = ranked.argmin(axis=1)
+        found = np.flatnonzero(ranked[np.arange(len(a)), a] < n)
+        a = a[found]
+        I[start + found] = a
+        J[start + found], K[start + found] = firstPairs(
+            index, rank[found], lo[found, a], hi[found, a], block)
+    return I, J, K
+
+def firstPairs(index, rank, lo, hi, block=1 << 22):
+    """return the arrays (j, k) of the pairs of the PairIndex that come first
+    (by the ranks of S[j] then S[k]) among the pairs lo[q]:hi[q] of the
+    index, with the ranks rank[q] of the elements of S, for each q. Ranges
+    are processed by batches of about block pairs."""
+    n = rank.shape[1]
+    J = np.zeros(len(lo), dtype=np.int64)
+    K = np.zeros(len(lo), dtype=np.int64)
+    lengths = hi - lo
+    cum = lengths.cumsum()
+    start = 0
+    while start < len(lo):
+        before = cum[start - 1] if start else 0
+        end = max(start + 1, np.searchsorted(cum, before + block, 'right'))
+        # the pairs of all ranges of the batch, one after the other
+        owner = np.repeat(np.arange(end - start), lengths[start:end])
+        offsets = cum[start:end] - lengths[start:end] - before
+        pos = (np.repeat(lo[start:end] - offsets, lengths[start:end]) +
+               np.arange(len(owner)))
+        j, k = index.j[pos], index.k[pos]
+        score = (rank[start + owner, j] * n + rank[start + owner, k])
+        # scores are distinct within a range
+        best = score == np.minimum.reduceat(score, offsets)[owner]
+        J[start:end], K[start:end] = j[best], k[best]
+        start = end
+    return J, K
+
+def nanOldStyleBatch(X, Sn, rng=None, index=None):
+    """return the list of the classes of the elements of X estimated by
+    1-Miclet: the class solution of a random class solvable triplet
+    (a, b, c) of Sn^3 such that a:b::c:x, or None if there is none. This is
+    tools.nanOldStyle with Sn shuffled before each call (see randomTriplets),
+    without the cubic scan. rng is the numpy random Generator used to draw
+    the triplets, index the PairIndex of Sn (built if not given)"""
+    if not len(X):
+        return []
+    index = PairIndex(Sn) if index is None else index
+    if not len(index):
+        return [None] * len(X)
+    labels = index.labels
+    I, J, K = randomTriplets(X, Sn, rng, index=index)
+    classes = labels[I] ^ labels[J] ^ labels[K]
+    return [c if i >= 0 else None for (i, c) in zip(I.tolist(),
+                                                    classes.tolist())]
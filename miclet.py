@@ -0,0 +1,215 @@
+""" Engine for the Miclet extension of S (see tools.constructAEMiclet). Its
+elements are in R^m (d = |c - a + b| componentwise) and not in {0, 1}^m, so
+they are stored in float32 arrays instead of integer codes, de-duplicated by
+hashing, and nn searches use the l1 distance (as tools.nn with tools.l1Dist)
+with a spatial index.
+
+Same results as tools.py, with elements as MicletSets instead of lists."""
+
+import numpy as np
+
+import bittools as bt
+from dataset import Dataset
+
+class MicletSet:
+    """Elements of R^m with their class: points[i] is the ith element and
+    labels[i] its class (0 or 1)"""
+
+    __slots__ = ('points', 'labels')
+
+    def __init__(self, points, labels):
+        self.points = np.asarray(points, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.uint8)
+
+    @classmethod
+    def of(cls, Sn):
+        """return the MicletSet of Sn: a list of elements (with their class at
+        the end), a Dataset or a MicletSet"""
+        if isinstance(Sn, MicletSet):
+            return Sn
+        if isinstance(Sn, Dataset):
+            shifts = np.arange(Sn.m - 1, -1, -1, dtype=np.int64)
+            return cls((Sn.codes[:, None] >> shifts) & 1, Sn.labels)
+        if not len(Sn):
+            return cls(np.zeros((0, 0)), [])
+        return cls([x[:-1] for x in Sn], [x[-1] for x in Sn])
+
+    def toLists(self):
+        """return the list of the elements (with their class at the end)"""
+        return [x + [c] for (x, c) in zip(self.points.tolist(),
+                                          self.labels.tolist())]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __eq__(self, other):
+        return (isinstance(other, MicletSet) and
+                np.array_equal(self.points, other.points) and
+                np.array_equal(self.labels, other.labels))
+
+class PointIds:
+    """Hashed ids of points: the first distinct point gets id 0, the next
+    one 1, etc."""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.ids = {}
+        self.chunks = [] # distinct points, by order of id
+
+    def __call__(self, points):
+        """return the array of the ids of the rows of points, giving new ids
+        to points that are seen for the first time"""
+        if not len(points):
+            return np.zeros(0, dtype=np.int64)
+        # -0. is the same point as 0. (adding 0. also copies points)
+        points = np.ascontiguousarray(points, dtype=np.float32) + 0.
+        # duplicates inside points are removed first, so that each distinct
+        # point is only hashed once
+        rows = points.view(np.dtype((np.void, 4 * self.dim))).ravel()
+        unique, first, inverse = np.unique(rows, return_index=True,
+                                           return_inverse=True)
+        # new points get their ids in their order of appearance in points
+        nIds = len(self.ids)
+        for u in np.sort(first).tolist():
+            self.ids.setdefault(rows[u].tobytes(), len(self.ids))
+        ids = np.array([self.ids[row.tobytes()] for row in unique],
+                       dtype=np.int64)
+        new = np.sort(first[ids >= nIds])
+        self.chunks.append(points[new])
+        return ids[inverse.ravel()]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def points(self):
+        """return the array of the distinct points, the point of id i being
+        the ith one"""
+        if not self.chunks:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate(self.chunks)
+
+def constructAEMiclet(Sn, chunkSize=None):
+    """return the analogical extension set of the sample set Sn, Miclet style:
+    This means that we allow memebers of AEMSn not to be in B^n but in R^n.
+    Classes however stay in B.
+    Sn is a list of elements, a Dataset or a MicletSet, and a MicletSet is
+    returned."""
+    S = MicletSet.of(Sn)
+    if not len(S):
+        return S
+    X, y = S.points, S.labels.astype(np.int64)
+    n, m = X.shape
+
+    # points of S get the first ids
+    pointIds = PointIds(m)
+    pointIds(X)
+    nInS = len(pointIds)
+
+    # blocks are smaller since each triplet needs m floats here
+    chunkSize = max(1, (chunkSize or bt.CHUNK_SIZE) // max(1, m))
+    votes = bt.emptyVotes()
+    for i, j, k in bt.tripletBlocks(n, chunkSize):
+        ok = (y[i] == y[j]) | (y[i] == y[k])
+        i, j, k = i[ok], j[ok], k[ok]
+        d = np.abs(X[k] - X[i] + X[j])
+        dclass = np.where(y[i] == y[j], y[k], y[j])
+        votes = bt.mergeVotes(votes, (pointIds(d) << 1) | dclass,
+                              bt.packPos(i, j, k))
+    ids, classes = bt.majorityVote(*votes)
+
+    new = ids >= nInS
+    return MicletSet(np.concatenate((X, pointIds.points()[ids[new]])),
+                     np.concatenate((S.labels, classes[new])))
+
+class L1Index:
+    """Index of points of R^m for exact 1nn searches with the l1 distance. As
+    in a kd-tree, points are recursively split (at the median of their
+    widest component) into leaves of at most leafSize points. The leaves
+    are then searched by increasing distance of their bounding box to the
+    query, until the box is farther than the current nn."""
+
+    def __init__(self, points, leafSize=64):
+        self.points = np.asarray(points, dtype=np.float32)
+        leaves = []
+        todo = [np.arange(len(self.points))]
+        while todo:
+            idx = todo.pop()
+            P = self.points[idx]
+            spread = P.max(axis=0) - P.min(axis=0) if len(idx) else 0
+            if len(idx) <= leafSize or not np.any(spread):
+                # equal points are only cut in pieces
+                leaves.extend(idx[start:start + leafSize]
+                              for start in range(0, len(idx), leafSize))
+                continue
+            order = np.argsort(P[:, np.argmax(spread)], kind='stable')
+            todo.extend((idx[order[:len(idx) // 2]],
+                         idx[order[len(idx) // 2:]]))
+
+        # leaves[l] holds the indices of the points of leaf l (-1 for none).
+        # Leaves are sorted by their first point, so that leaves at the same
+        # distance of a query are searched by increasing index.
+        leaves.sort(key=lambda idx: idx.min())
+        self.leaves = np.full((len(leaves), leafSize), -1, dtype=np.int64)
+        self.lo = np.zeros((len(leaves), self.points.shape[1]),
+                           dtype=np.float32)
+        self.hi = np.zeros_like(self.lo)
+        self.first = np.zeros(len(leaves), dtype=np.int64)
+        for l, idx in enumerate(leaves):
+            self.leaves[l, :len(idx)] = idx
+            self.first[l] = idx.min()
+            self.lo[l] = self.points[idx].min(axis=0)
+            self.hi[l] = self.points[idx].max(axis=0)
+
+    def query(self, X, block=1 << 22):
+        """return the array of the indices of the 1nn of each point of X. As
+        with tools.nn, the first minimal point is returned. Queries are
+        processed by batches so that about block numbers are computed at
+        once."""
+        X = np.asarray(X, dtype=np.float32)
+        indices = np.zeros(len(X), dtype=np.int64)
+        if not len(self.leaves):
+            return indices
+        nLeaves, leafSize = self.leaves.shape
+        m = self.points.shape[1]
+        step = max(1, block // (nLeaves * max(1, m)))
+        for start in range(0, len(X), step):
+            indices[start:start + step] = self._query(X[start:start + step])
+        return indices
+
+    def _query(self, X):
+        """return the indices of the 1nn of each point of X (a batch)"""
+        q = np.arange(len(X))
+        # lower bound of the distance between each query and each leaf
+        bounds = (np.maximum(self.lo[None] - X[:, None], 0) +
+                  np.maximum(X[:, None] - self.hi[None], 0)).sum(axis=2)
+        order = np.argsort(bounds, axis=1, kind='stable')
+        best = np.full(len(X), np.inf, dtype=np.float32)
+        bestIdx = np.full(len(X), len(self.points), dtype=np.int64)
+        for rank in range(order.shape[1]):
+            leaf = order[:, rank]
+            # a leaf as far as the current nn may hold a point of lower index
+            bound = bounds[q, leaf]
+            active = np.flatnonzero((bound < best) | ((bound == best) &
+                                    (self.first[leaf] < bestIdx)))
+            if not len(active):
+                break
+            idx = self.leaves[leaf[active]]
+            dists = np.abs(self.points[idx] - X[active, None]).sum(axis=2)
+            dists[idx < 0] = np.inf
+            dmin = dists.min(axis=1)
+            imin = np.where((dists == dmin[:, None]) & (idx >= 0), idx,
+                            len(self.points)).min(axis=1)
+            better = ((dmin < best[active]) |
+                      ((dmin == best[active]) & (imin < bestIdx[active])))
+            best[active[better]] = dmin[better]
+            bestIdx[active[better]] = imin[better]
+        return bestIdx
+
+def nnBatch(X, S):
+    """return the list of the indices in S of the 1nn of each element of X
+    with the l1 distance (as tools.nn with tools.l1Dist). X and S are lists
+    of elements (with their class at the end), Datasets or MicletSets."""
+    X, S = MicletSet.of(X), MicletSet.of(S)
+    if not len(X):
+        return []
+    return L1Index(S.points).query(X.points).tolist()
@@ -5,32 +5,24 @@ and construct plots showing accuracy of the NaN classifier.'''
 
 import sys
 import os
-import pickle
+import time
 import matplotlib.pyplot as plt
 import argparse
 
 import accuracy
+from cache import ResultsCache
+from functions import functions
 
 
-functions = {
-        'monk2' : accuracy.monk2,
-        'isEven' : accuracy.isEven,
-        'kOfm' : lambda x: True, # redefined later because we need m
-        'xor' : lambda x: x[-1] ^ x[-2],
-        'or' : lambda x: x[-1] or x[-2],
-        'and' : lambda x: x[-1] and x[-2],
-        'andFourLast' : lambda x: x[-1] and x[-2] and x[-3] and x[-4],
-        'firstAndLast' : lambda x: x[0] and x[-1],
-        'monkAllButOne' : lambda x: sum(x) == m-1
-        }
-
 desc = ('Run batch of experiments for a given Boolean function in given ' +
         'dimension, and construct plots showing accuracy of the NaN ' +
         'classifier.')
 parser = argparse.ArgumentParser(description=desc)
 parser.add_argument('m', type=int, default=8, nargs='?',
-                    help='dimension of universe X.  Default is 8',
-                    choices=range(4, 12), metavar='<dimension>')
+                    help='dimension of universe X.  Default is 8. Above ' +
+                    str(accuracy.MAX_FULL_M) + ', experiments are evaluated ' +
+                    'on a random sample of X (see -testSize).',
+                    choices=range(4, 31), metavar='<dimension>')
 parser.add_argument('fname', type=str, default='xor', nargs='?',
                     help='Name of the Boolean function to use. Accepted ' +
                     'values are ' + ', '.join(functions.keys()) + '. Default '
@@ -38,6 +30,65 @@ parser.add_argument('fname', type=str, default='xor', nargs='?',
 parser.add_argument('-nExp', type=int, default=100, nargs='?',
                     help='number of experiences. Default is 100.',
                     metavar='<number of exp>')
+parser.add_argument('-engine', type=str, default='python', nargs='?',
+                    help='engine used to construct the extension sets. ' +
+                    'Accepted values are ' + ', '.join(accuracy.engines) +
+                    '. Default is python.', choices=accuracy.engines,
+                    metavar='<engine>')
+parser.add_argument('-jobs', type=int, default=1, nargs='?',
+                    help='number of processes running the experiments. ' +
+                    'Default is 1.', metavar='<number of jobs>')
+parser.add_argument('-seed', type=int, default=0, nargs='?',
+                    help='seed of the experiments. Results only depend on ' +
+                    'the seed, not on the number of jobs. Default is 0.',
+                    metavar='<seed>')
+parser.add_argument('--nested', dest='nested', action='store_const',
+                    const=True, default=False, help='draw nested training ' +
+                    'sets along the sweep, so that the extension sets are ' +
+                    'constructed incrementally (much faster)')
+parser.add_argument('--exact', dest='exact', action='store_const',
+                    const=True, default=False, help='evaluate all training ' +
+                    'sets (up to the symmetries of the function) instead of ' +
+                    'sampling them, for the sizes of S where it takes at ' +
+                    'most nExp experiments')
+parser.add_argument('-tol', type=float, default=None, nargs='?',
+                    help='stop the experiments of a size of S once the ' +
+                    'standard error of the accuracies is below this ' +
+                    'tolerance (nExp is then a maximum).',
+                    metavar='<tolerance>')
+parser.add_argument('-testSize', type=int, default=None, nargs='?',
+                    help='evaluate the experiments on this number of random ' +
+                    'elements of X instead of all of them. Default is ' +
+                    str(accuracy.DEFAULT_TEST_SIZE) + ' above dimension ' +
+                    str(accuracy.MAX_FULL_M) + ', and all of X otherwise.',
+                    metavar='<size>')
+parser.add_argument('-cache', type=str, default='./cache', nargs='?',
+                    help='folder where the results of the experiments are ' +
+                    'cached. Default is ./cache.', metavar='<folder>')
+parser.add_argument('--no-cache', dest='use_cache', action='store_const',
+                    const=False, default=True, help='neither use nor store ' +
+                    'cached results')
+parser.add_argument('--plot-only', dest='plot_only', action='store_const',
+                    const=True, default=False, help='do not run any ' +
+                    'experiment: only plot the cached results')
+parser.add_argument('-profile', type=str, default=None, nargs='?',
+                    help='profile the experiments that are run, and append ' +
+                    'their records (time spent in each stage, number of ' +
+                    'triplets...) to this file, as JSON lines.',
+                    metavar='<file>')
+parser.add_argument('--live', dest='live', action='store_const', const=True,
+                    default=False, help='show the progress of the ' +
+                    'experiments, and re-render the plots (on the window ' +
+                    'with --show, in the file with --savefig) as results ' +
+                    'come in. Ctrl-C stops the experiments and plots the ' +
+                    'results obtained so far.')
+parser.add_argument('-refresh', type=float, default=5., nargs='?',
+                    help='minimal time between two renderings of the plots ' +
+                    'in live mode, in seconds. Default is 5.',
+                    metavar='<seconds>')
+parser.add_argument('-log', type=str, default=None, nargs='?',
+                    help='append the results of the experiments that are ' +
+                    'run to this file, as JSON lines.', metavar='<file>')
 parser.add_argument('--show', dest='show', action='store_const', const=True,
                     default=False, help='show plots on matplotlib window')
 parser.add_argument('--savefig', dest='save_figure', action='store_const',
@@ -47,11 +98,10 @@ parser.add_argument('-format', type=str, default='pdf', nargs='?',
                     help='format for saving of images. Default is pdf.',
                     metavar='<format>')
 args = parser.parse_args()
+if args.plot_only and not args.use_cache:
+    parser.error('--plot-only needs the cache')
 
 
-# update of k of m function now that m is defined
-functions['kOfm'] = lambda x: sum(x) >= args.m / 2
-
 # values of |S|
 ns =  [3, 4, 5, 7, 10, 15, 20, 30, 40, 50, 75, 100]
 
@@ -61,23 +111,44 @@ val_names = ['avgAccNanMV', 'avgAccNanThry1MV', 'avgErr1MV', 'avgAccNnS',
         'avgGammaMV', 'avgAccNanThry2MV', 'avgErr2MV', 'avgAccNanThry3MV',
         'avgErr3MV', 'avgPropAMV', 'avgPropBMV']
 
-for k in val_names:
-    d[k] = []
-
 d['m'] = args.m
 d['fname'] = args.fname
 f = functions[args.fname]
 d['n_exp'] = args.nExp
 
-# for each size of S, launch nExp experiments and retrieve results
-for n in ns:
-    try:
-        res = accuracy.main(d['m'], n, d['n_exp'], f)
-        for k in val_names:
-            d[k].append(res[k])
-    except accuracy.Sn_Too_Small:
-        for k in val_names:
-            d[k].append(0)
+def collect(res):
+    """fill d with the infos of each size of S in res"""
+    for k in val_names:
+        # sizes of S too big for the universe (or without results yet) are
+        # left out
+        d[k] = [res[n][k] if n in res else 0 for n in ns]
+
+def render():
+    """draw the plots, and save them if asked to"""
+    fig.clf()
+    ecai_plots()
+    if args.save_figure:
+        if not os.path.exists('./plots'):
+            os.makedirs('./plots')
+        plt.savefig('./plots/' + d['fname'] + 'm' + str(d['m']) + '.' +
+                    args.format, dpi=fig.dpi, bbox_inches='tight')
+    if args.show and args.live:
+        plt.pause(.001)
+
+lastRender = [0.]
+def onProgress(done, total, partialInfos):
+    """print the progress of the sweep, and re-render the plots from time to
+    time"""
+    elapsed = time.time() - start
+    eta = elapsed * (total - done) / done if done else 0
+    sys.stderr.write('\r{0:d}/{1:d} tasks done, {2:.0f}s elapsed, ETA '
+                     '{3:.0f}s   '.format(done, total, elapsed, eta))
+    if done == total:
+        sys.stderr.write('\n')
+    if time.time() - lastRender[0] >= args.refresh:
+        collect(partialInfos())
+        render()
+        lastRender[0] = time.time()
 
 def ecai_plots():
 
@@ -105,12 +176,22 @@ def ecai_plots():
         ax.yaxis.set_ticks_position('none')
 
 fig = plt.figure(figsize=(14, 3))
-ecai_plots()
+if args.live and args.show:
+    plt.ion()
+    plt.show()
+
+# for each size of S, launch nExp experiments and retrieve results
+# results are cached after each experiment, so an interrupted run resumes
+# where it stopped
+cache = ResultsCache(args.cache) if args.use_cache else None
+start = time.time()
+res = accuracy.sweep(d['m'], ns, d['n_exp'], f, args.engine, args.seed,
+                     args.jobs, args.nested, cache, args.plot_only,
+                     args.profile, args.exact, args.tol, args.testSize,
+                     args.log, onProgress if args.live else None)
+collect(res)
+render()
 
-if args.save_figure:
-    if not os.path.exists('./plots'):
-        os.makedirs('./plots')
-    plt.savefig('./plots/' + d['fname'] + 'm' + str(d['m']) + '.' + args.format,
-            dpi=fig.dpi, bbox_inches='tight')
 if args.show:
+    plt.ioff()
     plt.show()
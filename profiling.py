@@ -0,0 +1,62 @@
+""" Lightweight instrumentation of the experiments: time spent in each stage
+and counters (e.g. number of triplets), collected in a record per
+experiment. When profiling is disabled, NoProfile is used instead of Profile
+and instrumentation costs almost nothing. """
+
+import contextlib
+import time
+from collections import defaultdict
+
+class Profile:
+    """Times (in seconds) and counters of the stages of an experiment"""
+
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.counters = {} # stage name -> stats dict filled by an engine
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """context manager adding the time spent in its block to stage name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def stats(self, name):
+        """return a dict to be filled with counters by stage name (see the
+        stats argument of the engines), or None if not profiling"""
+        stats = {}
+        self.counters[name] = stats
+        return stats
+
+    def count(self, name, value=1):
+        """add value to counter name"""
+        self.counts[name] += value
+
+    def record(self):
+        """return the record of the experiment: a dict with the times of the
+        stages and the counters"""
+        counts = dict(self.counts)
+        for name, stats in self.counters.items():
+            for key, value in stats.items():
+                counts[name + '.' + key] = value
+        return {'times' : dict(self.times), 'counts' : counts}
+
+class NoProfile:
+    """Same interface as Profile, but does nothing"""
+
+    _nullContext = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._nullContext
+
+    def stats(self, name):
+        return None
+
+    def count(self, name, value=1):
+        pass
+
+    def record(self):
+        return None
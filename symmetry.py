@@ -0,0 +1,114 @@
+""" Symmetries of a labelled universe, used to enumerate training sets up to
+symmetry.
+
+Permuting the components of the elements, or complementing some of them,
+preserves analogies (a:b::c:d stands componentwise, and the valid patterns
+0000, 1111, 0011, 1100, 0101, 1010 are closed under complement) and hamming
+distances. So if such a transformation g also preserves the labels of the
+universe, an experiment with the training set g(S) (in the same order) gives
+the same results as with S, and only one training set of each orbit needs to
+be evaluated. """
+
+import itertools
+import math
+
+import numpy as np
+
+def transposition(m, i, j):
+    """return the permutation of the codes of {0, 1}^m that swaps components
+    i and j (0 is the first component, i.e. the highest bit)"""
+    codes = np.arange(2**m, dtype=np.int64)
+    bi, bj = m - 1 - i, m - 1 - j
+    diff = ((codes >> bi) ^ (codes >> bj)) & 1
+    return codes ^ (diff << bi) ^ (diff << bj)
+
+def flip(m, *components):
+    """return the permutation of the codes of {0, 1}^m that complements the
+    given components"""
+    mask = sum(1 << (m - 1 - i) for i in components)
+    return np.arange(2**m, dtype=np.int64) ^ mask
+
+def symmetryGroup(labels, m, maxSize=1 << 16):
+    """return the array of the permutations of the codes (one per row) of a
+    group of symmetries of {0, 1}^m preserving labels. Its generators are
+    transpositions of two components, and complements of one or two
+    components, that preserve labels. They are added one by one as long as
+    the group has at most maxSize elements, so that it is always a group
+    (maybe not the whole group of the symmetries of labels)."""
+    labels = np.asarray(labels)
+    pairs = list(itertools.combinations(range(m), 2))
+    candidates = ([transposition(m, i, j) for (i, j) in pairs] +
+                  [flip(m, i) for i in range(m)] +
+                  [flip(m, i, j) for (i, j) in pairs])
+    generators = [g for g in candidates if np.array_equal(labels[g], labels)]
+
+    identity = np.arange(2**m, dtype=np.int64)
+    group = {identity.tobytes() : identity}
+    kept = []
+    for h in generators:
+        # a bigger group is at least twice as big
+        if 2 * len(group) > maxSize:
+            break
+        if h.tobytes() in group:
+            continue
+        bigger = closure(group, kept + [h], maxSize)
+        if bigger is None:
+            break
+        kept.append(h)
+        group = bigger
+    return np.array(list(group.values()))
+
+def closure(group, generators, maxSize):
+    """return the group generated by group (a dict of permutations by their
+    bytes) and generators, as such a dict, or None if it has more than
+    maxSize elements"""
+    group = dict(group)
+    todo = list(group.values())
+    while todo:
+        g = todo.pop()
+        for h in generators:
+            gh = h[g]
+            key = gh.tobytes()
+            if key not in group:
+                if len(group) == maxSize:
+                    return None
+                group[key] = gh
+                todo.append(gh)
+    return group
+
+def nSubsets(size, n):
+    """return the number of subsets of size n of a set of given size"""
+    return math.comb(size, n)
+
+def orbits(group, n, block=1 << 22):
+    """return (representatives, sizes): the subsets of size n of the
+    universe up to the symmetries of group. Each representative is the
+    canonical (smallest) sorted tuple of codes of its orbit, and sizes[i]
+    is the number of subsets of the orbit of the ith representative.
+    All subsets are enumerated, and mapped by all symmetries: this is only
+    tractable when nSubsets * len(group) is small."""
+    size = group.shape[1]
+    subsets = itertools.combinations(range(size), n)
+    step = max(1, block // (len(group) * max(1, n)))
+    canonicals = []
+    while True:
+        batch = np.array(list(itertools.islice(subsets, step)),
+                         dtype=np.int64).reshape(-1, n)
+        if not len(batch):
+            break
+        # images of each subset by each symmetry, sorted
+        canonicals.append(smallestImages(np.sort(group[:, batch], axis=2)))
+    representatives, sizes = np.unique(
+        np.concatenate(canonicals).reshape(-1, n), axis=0, return_counts=True)
+    return list(map(tuple, representatives.tolist())), sizes.tolist()
+
+def smallestImages(images):
+    """return the lexicographically smallest of the rows images[:, b], for
+    each b (images has shape (number of symmetries, batch, n))"""
+    # smallest[g, b] tells whether images[g, b] is still a candidate
+    smallest = np.ones(images.shape[:2], dtype=bool)
+    never = np.iinfo(images.dtype).max
+    for i in range(images.shape[2]):
+        column = np.where(smallest, images[:, :, i], never)
+        smallest &= column == column.min(axis=0)
+    return images[smallest.argmax(axis=0), np.arange(images.shape[1])]
@@ -0,0 +1,38 @@
+""" Tests of classifier.py: the classes predicted on the whole universe must
+be those of the nn in AEMV given by tools.py, with the table of the codes or
+with the sorted codes, and after a save/load round trip.
+
+Run with python3 -m pytest. """
+
+import pytest
+
+import classifier
+import tools as t
+from classifier import AnalogicalClassifier
+from test_tools import sampleGrid
+
+samples = sampleGrid((3, 4, 6))
+
+def universe(S):
+    m = len(S[0]) - 1
+    return [t.bitfield(code, m) for code in range(2**m)]
+
+def expectedClasses(S):
+    # classes of the nn in AEMV (tools.nnBatch ignores the class of X)
+    AEMV = t.constructAEMV(S)
+    X = [x + [0] for x in universe(S)]
+    return [AEMV[i][-1] for i in t.nnBatch(X, AEMV)]
+
+@pytest.mark.parametrize('maxTableM', [2, classifier.MAX_TABLE_M])
+@pytest.mark.parametrize('S', samples)
+def test_predict(S, maxTableM, monkeypatch):
+    monkeypatch.setattr(classifier, 'MAX_TABLE_M', maxTableM)
+    clf = AnalogicalClassifier().fit(S)
+    assert clf.predict(universe(S)).tolist() == expectedClasses(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_saveLoad(S, tmp_path):
+    path = tmp_path / 'clf.npz'
+    AnalogicalClassifier().fit(S).save(path)
+    clf = AnalogicalClassifier.load(path)
+    assert clf.predict(universe(S)).tolist() == expectedClasses(S)
@@ -0,0 +1,167 @@
+""" Tests of the engines: they must return exactly what the reference engine
+tools.py returns (sets in the same order, same majority tie-breaks) on random
+sample sets.
+
+Run with python3 -m pytest. """
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import accuracy
+import bittools as bt
+import lattice
+import miclet
+import tools as t
+from dataset import Dataset, ListEngine
+from functions import functions
+from test_tools import randomSample, sampleGrid
+
+samples = sampleGrid((3, 4, 6))
+
+# small blocks, so that triplets are spread over several blocks
+CHUNK_SIZE = 7
+
+@pytest.mark.parametrize('S', samples)
+def test_numpyConstructAEMV(S):
+    assert bt.constructAEMV(S, CHUNK_SIZE) == t.constructAEMV(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_numpyConstructAE(S):
+    assert bt.constructAE(S, CHUNK_SIZE) == t.constructAE(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_numpyGetOmegaMVEst(S):
+    assert bt.getOmegaMVEst(S, CHUNK_SIZE) == t.getOmegaMVEst(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_numpyConstructAEMiclet(S):
+    assert bt.constructAEMiclet(S, CHUNK_SIZE) == t.constructAEMiclet(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_numpyNnBatch(S):
+    X = randomSample(len(S[0]) - 1, 8, 'X')
+    assert bt.nnBatch(X, S) == t.nnBatch(X, S)
+
+@pytest.mark.parametrize('S', samples)
+def test_latticeConstructAEMV(S):
+    assert lattice.constructAEMV(S) == t.constructAEMV(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_latticeConstructAE(S):
+    assert lattice.constructAE(S) == t.constructAE(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_latticeGetOmegaMVEst(S):
+    assert lattice.getOmegaMVEst(S) == t.getOmegaMVEst(S)
+
+@pytest.mark.parametrize('e', [t, bt, lattice])
+@pytest.mark.parametrize('S', samples)
+def test_constructAEMVWithOmegaEst(e, S):
+    stats, distinctStats = {}, {}
+    fused = e.constructAEMVWithOmegaEst(S, stats=stats,
+                                        distinctStats=distinctStats)
+    assert fused == (t.constructAEMV(S), t.getOmegaMVEst(S))
+    separateStats, separateDistinctStats = {}, {}
+    e.constructAEMV(S, stats=separateStats)
+    e.getOmegaMVEst(S, stats=separateDistinctStats)
+    assert stats == separateStats
+    assert distinctStats == separateDistinctStats
+    referenceStats = {}
+    t.getOmegaMVEst(S, stats=referenceStats)
+    assert distinctStats == referenceStats
+
+def toDataset(S):
+    return Dataset.fromLists(S, len(S[0]) - 1)
+
+@pytest.mark.parametrize('S', samples)
+def test_datasetRoundTrip(S):
+    assert toDataset(S).toLists() == S
+
+@pytest.mark.parametrize('e', [ListEngine(t), bt, lattice])
+@pytest.mark.parametrize('S', samples)
+def test_datasetEngines(e, S):
+    D = toDataset(S)
+    assert e.constructAEMV(D) == toDataset(t.constructAEMV(S))
+    assert e.constructAE(D) == toDataset(t.constructAE(S))
+    assert e.getOmegaMVEst(D) == t.getOmegaMVEst(S)
+    X = randomSample(D.m, 8, 'X')
+    assert e.nnBatch(toDataset(X), D) == t.nnBatch(X, S)
+
+@pytest.mark.parametrize('e', [ListEngine(t), bt, lattice])
+def test_emptyDataset(e):
+    D = Dataset(4, [], [])
+    assert e.constructAEMV(D) == D
+    assert e.constructAE(D) == D
+    assert e.constructAEMVWithOmegaEst(D) == (D, 0)
+
+@pytest.mark.parametrize('fname', ['monk2', 'xor'])
+@pytest.mark.parametrize('n', [3, 10])
+def test_experimentsOfEngines(fname, n):
+    f = functions[fname]
+    results = [accuracy.experiment(5, n, f, 'test', engine)
+               for engine in accuracy.engines]
+    for res in results:
+        res.pop('profile')
+    assert all(res == results[0] for res in results)
+
+@pytest.mark.parametrize('seed', range(2))
+def test_nanOldStyleBatchFrequencies(seed):
+    # the class of each x must follow the law of tools.nanOldStyle on a
+    # freshly shuffled S (random.shuffle is not numpy's, so only the
+    # frequencies can be compared)
+    S = randomSample(4, 6, seed)
+    X = randomSample(4, 16, 'X')
+    rd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    draws, batchDraws = 300, 3000
+    for x in X:
+        ref = []
+        for _ in range(draws):
+            shuffled = S[:]
+            rd.shuffle(shuffled)
+            ref.append(t.nanOldStyle(x, shuffled))
+        batch = lattice.nanOldStyleBatch([x] * batchDraws, S, rng)
+        assert (None in ref) == (None in batch)
+        if None not in ref:
+            assert abs(ref.count(1) / draws -
+                       batch.count(1) / batchDraws) < 0.12
+
+def test_nanOldStyleBatchEmpty():
+    assert lattice.nanOldStyleBatch(randomSample(3, 4, 'X'), []) == [None] * 4
+
+@pytest.mark.parametrize('S', samples)
+def test_micletConstructAEMiclet(S):
+    assert (miclet.constructAEMiclet(S, CHUNK_SIZE).toLists() ==
+            t.constructAEMiclet(S))
+
+def l1NN(X, S):
+    # indices of tools.nn with the l1 distance (the first minimal element)
+    return [min(range(len(S)), key=lambda i: t.l1Dist(x[:-1], S[i][:-1]))
+            for x in X]
+
+@pytest.mark.parametrize('S', samples)
+def test_micletNnBatch(S):
+    # points of the Miclet extension are in {0, 1, 2}^m: many ties
+    AE = t.constructAEMiclet(S)
+    X = randomSample(len(S[0]) - 1, 8, 'X') + AE
+    assert miclet.nnBatch(X, AE) == l1NN(X, AE)
+    # small leaves, so that ties fall across leaves
+    index = miclet.L1Index(miclet.MicletSet.of(AE).points, leafSize=2)
+    assert (index.query(miclet.MicletSet.of(X).points).tolist() ==
+            l1NN(X, AE))
+
+@pytest.mark.parametrize('S', samples)
+def test_incrementalAEMV(S):
+    # S grows by uneven steps, with triplets spread over several blocks
+    aemv = bt.IncrementalAEMV(chunkSize=3)
+    sizes = itertools.accumulate(itertools.cycle((1, 3, 2)))
+    sizes = itertools.takewhile(lambda k: k < len(S), sizes)
+    for k in itertools.chain(sizes, [len(S)]):
+        old, stats = len(aemv.S), {}
+        aemv.add(S[old:k], stats)
+        assert stats['triplets'] == k**3 - old**3
+        assert aemv.constructAEMV() == t.constructAEMV(S[:k])
+        assert aemv.getOmegaMVEst() == t.getOmegaMVEst(S[:k])
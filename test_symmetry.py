@@ -0,0 +1,43 @@
+""" Tests of the symmetries of symmetry.py and of the exact mode of
+accuracy.sweep, that evaluates one training set per orbit: its averages must
+be those of all the training sets of the universe, in all orders.
+
+Run with python3 -m pytest. """
+
+import itertools
+
+import numpy as np
+import pytest
+
+import accuracy
+import symmetry
+from functions import functions
+from universe import getUniverse
+
+@pytest.mark.parametrize('fname', ['monk2', 'isEven', 'xor', 'kOfm'])
+@pytest.mark.parametrize('maxSize', [4, 1 << 16])
+def test_symmetryGroup(fname, maxSize):
+    m = 4
+    labels = getUniverse(m, functions[fname]).labels
+    G = symmetry.symmetryGroup(labels, m, maxSize)
+    assert 1 <= len(G) <= maxSize
+    keys = {g.tobytes() for g in G}
+    assert len(keys) == len(G)
+    assert np.arange(2**m).tobytes() in keys
+    for g in G:
+        assert np.array_equal(labels[g], labels)
+        assert all(h[g].tobytes() in keys for h in G)
+
+@pytest.mark.parametrize('fname, expected', [('monk2', 0.41374),
+                                             ('isEven', 0.69231)])
+def test_exactSweep(fname, expected):
+    m, n = 4, 3
+    f = functions[fname]
+    exact = accuracy.sweep(m, [n], 2000, f, 'numpy', seed=0, exact=True)[n]
+    bruteForce = accuracy.aggregate(
+            [accuracy.experiment(m, n, f, S, 'numpy')
+             for S in itertools.permutations(range(2**m), n)])
+    for key, value in exact.items():
+        if key.startswith('avg'):
+            assert value == pytest.approx(bruteForce[key], abs=1e-9)
+    assert exact['avgAccNanMV'] == pytest.approx(expected, abs=1e-5)
@@ -0,0 +1,99 @@
+""" Regression tests of the hashed builders of tools.py: they must return
+exactly what the original list-scan versions (kept below as baseline) return,
+order included, on random sample sets (with or without repeated elements).
+
+Run with python3 -m pytest. """
+
+import random
+from collections import defaultdict
+
+import pytest
+
+import tools as t
+
+def randomSample(m, n, seed, repeats=False):
+    """return n random elements of {0, 1}^m with a random class, distinct
+    unless repeats is True"""
+    rd = random.Random(seed)
+    if repeats:
+        codes = [rd.randrange(2**m) for _ in range(n)]
+    else:
+        codes = rd.sample(range(2**m), n)
+    return [t.bitfield(code, m) + [rd.randint(0, 1)] for code in codes]
+
+def sampleGrid(ms, repeats=(False,)):
+    """return random sample sets of each dimension of ms and a few sizes
+    (also used by the other test modules)"""
+    return [randomSample(m, n, seed, rep) for m in ms for n in (1, 2, 5, 8)
+            for seed in range(3) for rep in repeats]
+
+samples = sampleGrid((3, 4, 5), (False, True))
+
+def listScanConstructAEMiclet(Sn):
+    sols = defaultdict(lambda: defaultdict(int))
+    for a, b, c in t.tripletGenerator(Sn):
+        if t.isSolvableBool(a[-1], b[-1], c[-1]):
+            d = [abs(ci - ai + bi) for (ai, bi, ci) in zip(a, b, c)]
+            d[-1] = t.solveBool(a[-1], b[-1], c[-1])
+            sols[tuple(d[:-1])][d[-1]] += 1
+    AEMiclet = [x for x in Sn]
+    for x, vals in sols.items():
+        xlist = list(x)
+        if xlist in (x[:-1] for x in AEMiclet): continue
+        maj_class = max(vals.keys(), key=lambda k: vals[k])
+        AEMiclet.append(xlist + [maj_class])
+    return AEMiclet
+
+def listScanConstructAE(Sn):
+    aux = []
+    for a, b, c in t.tripletGenerator(Sn):
+        if t.isSolvableVect(a, b, c):
+            d = t.solveVect(a, b, c)
+            if d not in aux:
+                aux.append(d)
+
+    def hasADouble(x, aux):
+        for y in aux:
+            if y[:-1] == x[:-1] and y[-1] != x[-1]:
+                return True
+        return False
+
+    AESn = [x for x in aux if not hasADouble(x, aux)]
+    for x in Sn:
+        if x not in AESn:
+            AESn.append(x)
+    return AESn
+
+def listScanConstructAEMV(Sn):
+    sols = defaultdict(lambda: defaultdict(int))
+    for a, b, c in t.tripletGenerator(Sn):
+        if t.isSolvableVect(a, b, c):
+            d = t.solveVect(a, b, c)
+            sols[tuple(d[:-1])][d[-1]] += 1
+    AEMV = [x for x in Sn]
+    for x, vals in sols.items():
+        xlist = list(x)
+        if xlist in (x[:-1] for x in AEMV): continue
+        maj_class = max(vals.keys(), key=lambda k: vals[k])
+        AEMV.append(xlist + [maj_class])
+    return AEMV
+
+def listScanGetAEStar(AESn, Sn):
+    return [x for x in AESn if x not in Sn]
+
+@pytest.mark.parametrize('S', samples)
+def test_constructAE(S):
+    assert t.constructAE(S) == listScanConstructAE(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_constructAEMV(S):
+    assert t.constructAEMV(S) == listScanConstructAEMV(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_constructAEMiclet(S):
+    assert t.constructAEMiclet(S) == listScanConstructAEMiclet(S)
+
+@pytest.mark.parametrize('S', samples)
+def test_getAEStar(S):
+    AEMV = listScanConstructAEMV(S)
+    assert t.getAEStar(AEMV, S) == listScanGetAEStar(AEMV, S)
@@ -4,10 +4,16 @@ from collections import defaultdict
 
 def bitfield(x, m):
     """binary representation (list) of integer x over m bits"""
-    b = [1 if digit=='1' else 0 for digit in bin(x)[2:]]
-    for i in range(len(b), m):
-        b.insert(0, 0)
-    return b
+    nBits = max(m, x.bit_length(), 1)
+    return [(x >> i) & 1 for i in range(nBits - 1, -1, -1)]
+
+def toCode(x):
+    """return the integer whose binary representation is the boolean vector x
+    (inverse of bitfield)"""
+    code = 0
+    for xi in x:
+        code = (code << 1) | xi
+    return code
 
 def isSolvableBool(ai, bi, ci):
     """return true if boolean analogy is solvable"""
@@ -53,10 +59,15 @@ def nanOldStyle(x, Sn):
     # there exists one 3-tuple such that AD is null).
     # As only the first tuple is returned, it's a good idea to shuffle Sn each
     # time you call nanOldStyle, else the elected 3-tuple will often be the
-    # same
-    for a, b, c in tripletGenerator(Sn):
+    # same (lattice.nanOldStyleBatch classifies a whole set of elements this
+    # way, without the shuffle)
+    # features are sliced once, not once per triplet
+    feats = [y[:-1] for y in Sn]
+    xFeats = x[:-1]
+    for i, j, k in tripletGenerator(range(len(Sn))):
         # on regarde si a:b::c:x (sans prendre en compte les classes)
-        if analogyStandsVect(a[:-1], b[:-1], c[:-1], x[:-1]):
+        if analogyStandsVect(feats[i], feats[j], feats[k], xFeats):
+            a, b, c = Sn[i], Sn[j], Sn[k]
             if isSolvableBool(a[-1], b[-1], c[-1]):
                 return solveBool(a[-1], b[-1], c[-1])
 
@@ -75,11 +86,13 @@ def constructAEMiclet(Sn):
             sols[dtuple][dclass] += 1
 
     AEMiclet = [x for x in Sn]
+    # elements of AEMiclet, without their class
+    inAE = set(tuple(x[:-1]) for x in AEMiclet)
     for x, vals in sols.items():
-        xlist = list(x)
-        if xlist in (x[:-1] for x in AEMiclet): continue
+        if x in inAE: continue
         maj_class = max(vals.keys(), key=lambda k: vals[k])
-        AEMiclet.append(xlist + [maj_class])
+        AEMiclet.append(list(x) + [maj_class])
+        inAE.add(x)
 
     return AEMiclet
 
@@ -93,33 +106,48 @@ def constructAE(Sn):
        Elements of Sn must have their class as last entry"""
 
     aux = [] # will contain every solution d, with doubles
+    inAux = set() # elements of aux, as tuples
     for a, b, c in tripletGenerator(Sn):
         if isSolvableVect(a, b, c):
             d = solveVect(a, b, c)
-            if d not in aux:
+            if tuple(d) not in inAux:
                 aux.append(d)
+                inAux.add(tuple(d))
+
+    # classes of each element of aux (without its class)
+    classes = defaultdict(set)
+    for y in aux:
+        classes[tuple(y[:-1])].add(y[-1])
 
-    def hasADouble(x, aux):
-        """return true if x is already in aux with another class"""
-        for y in aux:
-            if y[:-1] == x[:-1] and y[-1] != x[-1]:
-                return True
-        return False
+    def hasADouble(x):
+        """return true if x is in aux with another class"""
+        return len(classes[tuple(x[:-1])]) > 1
 
     # AESn = all elements from aux that do not have doubles
-    AESn = [x for x in aux if not hasADouble(x, aux)]
+    AESn = [x for x in aux if not hasADouble(x)]
 
     # elements from Sn might have been discarded (because of a double)
     # we need to add them again
+    inAESn = set(tuple(x) for x in AESn)
     for x in Sn:
-        if x not in AESn:
+        if tuple(x) not in inAESn:
             AESn.append(x)
+            inAESn.add(tuple(x))
 
     return AESn
 
-def constructAEMV(Sn):
+def countVotes(sols, n, stats):
+    """fill the stats dict (if any) with the number of triplets of S^3
+    (|S| = n) and the number of those that voted in sols"""
+    if stats is not None:
+        stats['triplets'] = n**3
+        stats['solvable'] = sum(sum(vals.values()) for vals in sols.values())
+
+def constructAEMV(Sn, stats=None):
     """Return the analogical extension set of Sn where we a majority vote
-    procedure is applied for calculating the analogical labels"""
+    procedure is applied for calculating the analogical labels
+    If stats is a dict, the number of triplets and of solvable triplets are
+    stored in it"""
 
     # sols is a dict with elements as keys and counts the number of 3-tuples
     # that predicted 1 or 0.
@@ -131,19 +159,30 @@ def constructAEMV(Sn):
             dtuple = tuple(d[:-1])
             dclass = d[-1]
             sols[dtuple][dclass] += 1
+    countVotes(sols, len(Sn), stats)
+
+    return extendWithMajority(Sn, sols)
+
+def extendWithMajority(Sn, sols):
+    """return AEMV: Sn followed by the elements of sols (that are not in Sn)
+    with their majority class"""
 
     # Majority vote procedure
     AEMV = [x for x in Sn]
+    # elements of AEMV, without their class
+    inAE = set(tuple(x[:-1]) for x in AEMV)
     for x, vals in sols.items():
-        xlist = list(x)
-        if xlist in (x[:-1] for x in AEMV): continue
+        if x in inAE: continue
         maj_class = max(vals.keys(), key=lambda k: vals[k])
-        AEMV.append(xlist + [maj_class])
+        AEMV.append(list(x) + [maj_class])
+        inAE.add(x)
 
     return AEMV
 
-def getOmegaMVEst(Sn):
-    """Return an estimation of Omega from Sn"""
+def getOmegaMVEst(Sn, stats=None):
+    """Return an estimation of Omega from Sn
+    If stats is a dict, the number of triplets and of solvable triplets (of
+    distinct elements) are stored in it"""
 
     sols = defaultdict(lambda: defaultdict(int))
 
@@ -154,6 +193,13 @@ def getOmegaMVEst(Sn):
             dtuple = tuple(d[:-1])
             dclass = d[-1]
             sols[dtuple][dclass] += 1
+    countVotes(sols, len(Sn), stats)
+
+    return omegaEstWithVotes(Sn, sols)
+
+def omegaEstWithVotes(Sn, sols):
+    """return the estimation of omega of Sn from the votes sols of the
+    triplets of distinct elements of Sn"""
 
     nOK = nKO = 0
     for x in Sn:
@@ -174,10 +220,32 @@ def getOmegaMVEst(Sn):
 
     return estW
 
+def constructAEMVWithOmegaEst(Sn, stats=None, distinctStats=None):
+    """return (constructAEMV(Sn), getOmegaMVEst(Sn)), enumerating the
+    triplets of Sn only once. stats and distinctStats are those of
+    constructAEMV and getOmegaMVEst"""
+
+    sols = defaultdict(lambda: defaultdict(int))
+    distinctSols = defaultdict(lambda: defaultdict(int))
+
+    for a, b, c in tripletGenerator(Sn):
+        if isSolvableVect(a, b, c):
+            d = solveVect(a, b, c)
+            dtuple = tuple(d[:-1])
+            dclass = d[-1]
+            sols[dtuple][dclass] += 1
+            if a is b or a is c or b is c: continue
+            distinctSols[dtuple][dclass] += 1
+    countVotes(sols, len(Sn), stats)
+    countVotes(distinctSols, len(Sn), distinctStats)
+
+    return extendWithMajority(Sn, sols), omegaEstWithVotes(Sn, distinctSols)
+
 
 def getAEStar(AESn, Sn):
     """return AE* = AESn\Sn"""
-    AEStar = [x for x in AESn if x not in Sn]
+    inSn = set(tuple(x) for x in Sn)
+    AEStar = [x for x in AESn if tuple(x) not in inSn]
     return AEStar
 
 def getOmega(AEStar, f):
@@ -215,3 +283,17 @@ def nn(x, S, dist):
     # note that there might be more than on minimal item. min will return the
     # first one ecountered
     return min(S, key=lambda y: dist(x, y[:-1]))
+
+def nnBatch(X, S):
+    """return the list of the indices in S of the 1nn of each element of X
+       using the hamming distance. All elements of X and S have their class
+       at the end."""
+
+    # as for nn, the first minimal item is returned. Features are only sliced
+    # once per element, not once per distance.
+    featsS = [y[:-1] for y in S]
+    nns = []
+    for x in X:
+        feats = x[:-1]
+        nns.append(min(range(len(S)), key=lambda i: hamming(feats, featsS[i])))
+    return nns
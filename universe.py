@@ -0,0 +1,149 @@
+""" The universe {0, 1}^m labelled by a target function, built once per (m, f)
+and shared by all the experiments (and all values of |S|) of a process.
+
+The universe is implicit: the element of code x is bitfield(x, m), and labels
+are computed in bulk, by blocks, only when they are needed. Tables of all the
+elements (or of all the labels) are only built on demand, which is only
+tractable for small dimensions.
+
+Tables can be put in shared memory (see SharedUniverse), so that the worker
+processes of a sweep attach to them instead of building their own copy. """
+
+import functools
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from dataset import Dataset
+from functions import TargetFunction
+
+# labels of the elements are computed by blocks of this size
+LABELS_BLOCK = 1 << 16
+
+# labels of universes up to this dimension are stored in a table
+MAX_TABLE_M = 20
+
+def bulkLabels(f, codes, m):
+    """return the array of the labels f(x) (as 0 or 1) of the elements of
+    given codes (an array or a range). f is a TargetFunction (see
+    functions.py), whose array form labels a whole block at once, or any
+    function of an element, which is then called on each element."""
+    shifts = np.arange(m - 1, -1, -1, dtype=np.int64)
+    labels = np.zeros(len(codes), dtype=np.uint8)
+    for start in range(0, len(codes), LABELS_BLOCK):
+        block = np.asarray(codes[start:start + LABELS_BLOCK], dtype=np.int64)
+        bits = (block[:, None] >> shifts) & 1
+        if isinstance(f, TargetFunction):
+            y = f.labels(bits)
+        else:
+            y = np.array([bool(f(x)) for x in bits.tolist()])
+        labels[start:start + len(bits)] = y
+    return labels
+
+class Universe:
+    """Elements of {0, 1}^m labelled by f: labels[code] is the class of the
+    element of code code (as 0 or 1, see tools.toCode). dataset holds all
+    the elements as a Dataset (element of index i has code i)."""
+
+    def __init__(self, m, f):
+        self.m = m
+        self.f = f
+
+    def __len__(self):
+        return 2**self.m
+
+    @functools.cached_property
+    def labels(self):
+        return bulkLabels(self.f, range(2**self.m), self.m)
+
+    @functools.cached_property
+    def dataset(self):
+        return Dataset(self.m, np.arange(2**self.m, dtype=np.int64),
+                       self.labels)
+
+    def labelsOf(self, codes):
+        """return the array of the labels of the elements of given codes.
+        They are looked up in labels up to MAX_TABLE_M, and computed
+        otherwise."""
+        if self.m <= MAX_TABLE_M:
+            return self.labels[codes]
+        return bulkLabels(self.f, codes, self.m)
+
+    def take(self, codes):
+        """return the Dataset of the elements of given codes"""
+        codes = np.asarray(codes, dtype=np.int64)
+        return Dataset(self.m, codes, self.labelsOf(codes))
+
+# universes of this process, by (m, f)
+universes = {}
+
+def getUniverse(m, f):
+    """return the Universe of dimension m labelled by f. It is only built the
+    first time."""
+    if (m, f) not in universes:
+        universes[m, f] = Universe(m, f)
+    return universes[m, f]
+
+class SharedUniverse:
+    """Tables of a Universe copied once into shared memory: its labels, and
+    the codes of its elements if withCodes is True. Other processes attach
+    to them with attachUniverse(handle()), without any copy. The shared
+    memory is released by close (or at the end of a with block)."""
+
+    def __init__(self, U, withCodes=True):
+        self.m = U.m
+        self.f = U.f
+        tables = {'labels' : U.labels}
+        if withCodes:
+            tables['codes'] = U.dataset.codes
+        self.blocks = {}
+        self.specs = {}
+        try:
+            for name, table in tables.items():
+                shm = shared_memory.SharedMemory(create=True,
+                                                 size=max(1, table.nbytes))
+                self.blocks[name] = shm
+                np.ndarray(table.shape, table.dtype, buffer=shm.buf)[:] = table
+                self.specs[name] = (shm.name, table.shape, table.dtype.str)
+        except BaseException:
+            # blocks already created are not left behind
+            self.close()
+            raise
+
+    def handle(self):
+        """return what other processes need to attach to the tables (it is
+        small, and can be pickled)"""
+        return self.m, self.f, self.specs
+
+    def close(self):
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# shared memory blocks attached by this process, kept open as long as the
+# process lives
+attached = []
+
+def attachUniverse(handle):
+    """make getUniverse return, in this process, the universe whose tables
+    are shared with the given handle (see SharedUniverse). Used as the
+    initializer of worker processes."""
+    m, f, specs = handle
+    tables = {}
+    for name, (shmName, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shmName)
+        attached.append(shm)
+        tables[name] = np.ndarray(shape, dtype, buffer=shm.buf)
+        tables[name].flags.writeable = False
+    U = Universe(m, f)
+    U.labels = tables['labels']
+    if 'codes' in tables:
+        U.dataset = Dataset(m, tables['codes'], tables['labels'])
+    universes[m, f] = U